@@ -0,0 +1,23 @@
+import time
+
+import pytest
+
+from doser import Dose, EDIBLE
+
+
+@pytest.fixture
+def dose():
+    return Dose.new("potato", EDIBLE, time.time() - 3 * 3600)
+
+
+def test_new(benchmark):
+    benchmark(Dose.new, "potato", EDIBLE)
+
+
+@pytest.mark.parametrize("attr", ["status", "prog_value", "time_left"])
+def test_property(benchmark, dose, attr):
+    benchmark(getattr, dose, attr)
+
+
+def test_state_at(benchmark, dose):
+    benchmark(dose.state_at, time.time())
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from itertools import count
+
+import pytest
+
+from doser.ui import DoseManager
+
+
+@pytest.fixture(params=[10, 1_000, 100_000], ids=lambda n: f"{n}rows")
+def manager(request, stub_page, make_doses):
+    loop = asyncio.new_event_loop()
+    dm = DoseManager()
+    dm.page = stub_page
+    loop.run_until_complete(dm.add_doses(make_doses(request.param)))
+    yield loop, dm
+    loop.close()
+
+
+def test_tick(benchmark, manager):
+    loop, dm = manager
+    # A second per tick, so every visible row is due
+    start = time.time()
+    seconds = count()
+
+    async def tick():
+        # Includes the send, as the page update is part of a tick's cost
+        await dm.tick(start + next(seconds))
+        await dm.flush()
+
+    benchmark(lambda: loop.run_until_complete(tick()))
+
+
+def test_evaluate_all(benchmark, manager):
+    _, dm = manager
+    benchmark(dm._collection.store.evaluate)
+
+
+def test_clear_expired(benchmark, manager):
+    loop, dm = manager
+    doses = dm.doses
+
+    def setup():
+        dm._collection.remove(list(dm._collection.doses.items()))
+        loop.run_until_complete(dm.add_doses(doses))
+
+    benchmark.pedantic(
+        lambda: loop.run_until_complete(dm.clear_expired()),
+        setup=setup,
+        rounds=20,
+    )
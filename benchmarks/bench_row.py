@@ -0,0 +1,24 @@
+from itertools import count
+
+from doser import Dose, EDIBLE
+from doser.ui import DoseRow
+
+
+def test_update(benchmark, stub_page):
+    dose = Dose.new("potato", EDIBLE)
+    row = DoseRow(dose, delete=print, reset=print)
+    row.page = stub_page
+    # A second per call, so the label changes and every update is sent
+    seconds = count()
+    benchmark(lambda: row.update(dose.state_at(dose.ingested + next(seconds))))
+    assert stub_page.sent
+
+
+def test_update_unchanged(benchmark, stub_page):
+    dose = Dose.new("potato", EDIBLE)
+    row = DoseRow(dose, delete=print, reset=print)
+    row.page = stub_page
+    state = dose.state_at(dose.ingested)
+    row.update(state)
+    benchmark(row.update, state)
+    assert stub_page.sent == 1
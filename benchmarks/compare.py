@@ -0,0 +1,246 @@
+"""Benchmark regression gate.
+
+Runs the benchmark suite (or reads an existing ``--results`` file), compares
+each benchmark's fastest round over ``--repeat`` runs of the suite against
+``benchmarks/baseline.json`` and prints a delta table. Exits non-zero when a gated hot path is slower than the
+baseline by more than ``--threshold``, or ``--fast-threshold`` for benchmarks
+that take under a microsecond.
+
+The minimum is used because it is the statistic least moved by other load on
+the machine; medians on a busy host drift by tens of percent between
+identical runs. Each run takes at least ``MIN_ROUNDS`` rounds, and repeating
+the suite spreads them over minutes, so a slow spell has to outlast every run
+to move the result. Sub-microsecond benchmarks
+get the wider threshold since timer and loop overhead are a large share of
+what they measure.
+
+Timings are only comparable on the machine that produced them, so the
+committed baseline is for the host it was recorded on, and should be
+refreshed in the same commit as any change to the code it measures.
+Elsewhere, regenerate it with ``--update-baseline`` before making changes, or
+pass ``--baseline-ref`` to run the suite as of a git ref in a temporary
+worktree and compare against that instead.
+
+    python benchmarks/compare.py
+    python benchmarks/compare.py --baseline-ref main
+    python benchmarks/compare.py --threshold 0.5 --gate 'test_new$'
+    python benchmarks/compare.py --update-baseline
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).parent
+BASELINE = HERE / "baseline.json"
+STAT = "min"
+MIN_ROUNDS = 50
+# Baselines faster than this are gated by --fast-threshold
+FAST = 1e-6
+# Hot paths that fail the gate; every other benchmark is only reported
+GATED = (
+    r"::test_property\[status\]$",
+    r"::test_tick\[",
+    r"::test_clear_expired\[100000rows\]$",
+)
+
+
+def run_suite(results: Path, root: Path = HERE.parent):
+    """Runs the benchmarks of the checkout at ``root`` against its own code"""
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-q",
+            *(
+                str(p.relative_to(root))
+                for p in sorted(root.glob("benchmarks/bench_*.py"))
+            ),
+            f"--benchmark-min-rounds={MIN_ROUNDS}",
+            f"--benchmark-json={results}",
+        ],
+        cwd=root,
+        check=True,
+    )
+
+
+def measure(root: Path = HERE.parent, repeat: int = 1) -> dict[str, float]:
+    """Runs the suite at ``root`` ``repeat`` times and keeps each benchmark's
+    fastest result"""
+    best = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeat):
+            results = Path(tmp) / f"run{i}.json"
+            run_suite(results, root)
+            for name, seconds in load_results(results).items():
+                best[name] = min(seconds, best.get(name, seconds))
+    return best
+
+
+def measure_ref(ref: str, repeat: int = 1) -> dict[str, float]:
+    """Measures the suite as of git ``ref`` in a temporary worktree"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = Path(tmp) / "tree"
+        git = ["git", "-C", str(HERE.parent), "worktree"]
+        subprocess.run([*git, "add", "--detach", str(tree), ref], check=True)
+        try:
+            return measure(tree, repeat)
+        finally:
+            subprocess.run([*git, "remove", "--force", str(tree)], check=True)
+
+
+def load_results(path: Path) -> dict[str, float]:
+    data = json.loads(path.read_text())
+    return {b["fullname"]: b["stats"][STAT] for b in data["benchmarks"]}
+
+
+def load_baseline(path: Path) -> dict[str, float]:
+    data = json.loads(path.read_text())
+    if data.get("stat") != STAT:
+        raise SystemExit(
+            f"{path} holds {data.get('stat')} timings, not {STAT};"
+            " regenerate it with --update-baseline"
+        )
+    return data["benchmarks"]
+
+
+def write_baseline(path: Path, results: dict[str, float]):
+    path.write_text(
+        json.dumps({"stat": STAT, "benchmarks": results}, indent=2, sort_keys=True)
+        + "\n"
+    )
+
+
+def format_time(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(
+    baseline: dict[str, float],
+    current: dict[str, float],
+    threshold: float,
+    gates: list[str],
+    fast_threshold: float = None,
+) -> list[str]:
+    """Prints the delta table and returns the gated benchmarks that regressed"""
+    fast_threshold = threshold if fast_threshold is None else fast_threshold
+    gated = [re.compile(g) for g in gates]
+    failures = []
+    rows = [("benchmark", "baseline", "current", "delta", "")]
+    for name in sorted(baseline.keys() | current.keys()):
+        old, new = baseline.get(name), current.get(name)
+        delta = (new - old) / old if old and new is not None else None
+        is_gated = any(g.search(name) for g in gated)
+        allowed = fast_threshold if old is not None and old < FAST else threshold
+        if is_gated and delta is not None and delta > allowed:
+            failures.append(name)
+            verdict = "REGRESSED"
+        else:
+            verdict = "gated" if is_gated else ""
+        rows.append(
+            (
+                name,
+                format_time(old),
+                format_time(new),
+                "-" if delta is None else f"{delta:+.1%}",
+                verdict,
+            )
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print(
+            "  ".join(
+                cell.ljust(w) if i in (0, 4) else cell.rjust(w)
+                for i, (cell, w) in enumerate(zip(row, widths))
+            ).rstrip()
+        )
+    return failures
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--results",
+        type=Path,
+        help="pytest-benchmark JSON to check instead of running the suite",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="runs of the suite to take each benchmark's fastest result from"
+        " (default 3)",
+    )
+    parser.add_argument(
+        "--baseline-ref",
+        metavar="REF",
+        help="run the suite as of this git ref on this machine and compare"
+        " against it instead of --baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed slowdown as a fraction of the baseline (default 0.25)",
+    )
+    parser.add_argument(
+        "--fast-threshold",
+        type=float,
+        default=1.0,
+        help="allowed slowdown for benchmarks whose baseline is under 1us"
+        " (default 1.0)",
+    )
+    parser.add_argument(
+        "--gate",
+        action="append",
+        help="regex of benchmark names that fail the run when they regress;"
+        " may be repeated (default: Dose.status, ticks and clear_expired at 100k)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the results to the baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+    if args.baseline_ref and args.update_baseline:
+        parser.error("--baseline-ref cannot be combined with --update-baseline")
+
+    if args.results is None:
+        current = measure(repeat=args.repeat)
+    else:
+        current = load_results(args.results)
+
+    if args.update_baseline:
+        write_baseline(args.baseline, current)
+        print(f"Wrote {len(current)} benchmarks to {args.baseline}")
+        return 0
+
+    if args.baseline_ref:
+        baseline = measure_ref(args.baseline_ref, args.repeat)
+    else:
+        baseline = load_baseline(args.baseline)
+    failures = compare(
+        baseline, current, args.threshold, args.gate or GATED, args.fast_threshold
+    )
+    if failures:
+        print(
+            f"\n{len(failures)} hot path(s) regressed past their threshold:"
+            f" {', '.join(failures)}"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Benchmarks for the dose model and ticker hot paths.
+
+These are not collected by a plain ``pytest`` run. Run them explicitly:
+
+    python -m pytest benchmarks/bench_*.py
+
+Results are written to ``benchmarks/results.json`` unless ``--benchmark-json``
+is given.
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from doser import DRY_HERB, Dose, EDIBLE, FAKE_TEST_INGEST
+
+RESULTS = Path(__file__).with_name("results.json")
+METHODS = (EDIBLE, DRY_HERB, FAKE_TEST_INGEST)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    if config.getoption("benchmark_json", None) is None:
+        config.option.benchmark_json = str(RESULTS)
+
+
+class StubPage:
+    """Stands in for a connected flet page; updates go nowhere"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def update(self, *controls):
+        self.sent += len(controls) or 1
+
+    async def update_async(self, *controls):
+        self.update(*controls)
+
+
+@pytest.fixture
+def stub_page():
+    return StubPage()
+
+
+@pytest.fixture
+def make_doses():
+    def make(count: int, at: float = None) -> list[Dose]:
+        """``count`` doses ingested over the eight hours before ``at``, so the
+        mix covers processing, active and expired doses"""
+        at = time.time() if at is None else at
+        step = 8 * 3600 / count
+        return [
+            Dose.new(str(i), METHODS[i % len(METHODS)], at - i * step)
+            for i in range(count)
+        ]
+
+    return make
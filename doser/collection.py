@@ -0,0 +1,248 @@
+import threading
+import time
+import weakref
+from itertools import count
+from typing import Callable, Iterable, NamedTuple, Sequence
+
+from pendulum import DateTime
+
+from doser.core import Dose, DoseStatus
+from doser.journal import DoseJournal
+from doser.locks import RWLock
+from doser.metrics import registry
+from doser.scheduler import ExpiryIndex, OnsetCounter
+from doser.store import DoseStore, StoreState
+
+
+class DoseEvent(NamedTuple):
+    """A change to a DoseCollection.
+
+    ``op`` is "add" or "reset" with the new ``doses`` for ``slots``, or the
+    journal op a removal was recorded as ("delete", "clear" or "archive") with
+    no doses.
+    """
+
+    op: str
+    slots: tuple[int, ...]
+    doses: tuple[Dose, ...] = ()
+
+
+class TickFrame:
+    """Collection-wide state at one instant, shared by every view ticking at it.
+
+    Each value is worked out on first use and reused by later views in the
+    same pass. A frame only describes the collection as of ``version``; see
+    DoseCollection.frame. Callers hold the read side of the collection's lock.
+    """
+
+    def __init__(self, collection: "DoseCollection", at: float):
+        self.collection = collection
+        self.at = at
+        self.version = collection.version
+        # Status code, progress and seconds remaining by slot
+        self._states: dict[int, tuple[int, float, float]] = {}
+        self._changes: dict[int, dict[int, float]] = {}
+        self._expiries: dict[float, float | None] = {}
+        self._expired: int | None = None
+
+    def _evaluate(self, slots: list[int]) -> StoreState:
+        state = self.collection.store.evaluate(self.at, slots)
+        self._states.update(
+            zip(
+                slots,
+                zip(
+                    state.status.tolist(),
+                    state.progress.tolist(),
+                    state.remaining.tolist(),
+                ),
+            )
+        )
+        return state
+
+    def states(self, slots: Sequence[int]) -> list[tuple[int, float, float]]:
+        """``DoseStore.evaluate`` at ``at`` as (status code, progress, seconds
+        remaining) per slot, evaluating only slots not seen yet"""
+        states = self._states
+        if missing := [slot for slot in slots if slot not in states]:
+            self._evaluate(missing)
+        return [states[slot] for slot in slots]
+
+    def next_change(self, slots: Sequence[int], progress_steps: int) -> list[float]:
+        """``DoseStore.next_change`` at ``at``, evaluating only slots no view
+        has asked for yet"""
+        changes = self._changes.setdefault(progress_steps, {})
+        if missing := [slot for slot in slots if slot not in changes]:
+            store = self.collection.store
+            computed = store.next_change(
+                self.at, missing, progress_steps, self._evaluate(missing)
+            )
+            changes.update(zip(missing, computed.tolist()))
+        return [changes[slot] for slot in slots]
+
+    def count_expired(self) -> int:
+        if self._expired is None:
+            self._expired = self.collection._expiry.count_expired(self.at)
+        return self._expired
+
+    def next_expiry(self, after: float = None) -> float | None:
+        """The first expiry after ``after`` (default ``at``)"""
+        after = self.at if after is None else after
+        if after not in self._expiries:
+            self._expiries[after] = self.collection._expiry.next_expiry(after)
+        return self._expiries[after]
+
+
+class DoseCollection:
+    """The authoritative set of tracked doses, shared by every view of it.
+
+    Doses are kept by store slot in display order. Each mutation is applied
+    under the write side of ``lock`` and then published as a DoseEvent to
+    every subscriber, so views (e.g. one DoseManager per screen) update their
+    own scheduling and window incrementally instead of re-reading the whole
+    collection.
+    Subscribers are held weakly and need not unsubscribe.
+
+    Each new TickFrame publishes the collection's dose counts by status as
+    ``dose_collection.doses`` gauges, so metrics scrapes never touch the
+    collection.
+    """
+
+    _ids = count(1)
+
+    def __init__(self, journal: DoseJournal = None):
+        self.lock = RWLock("dose_lock")
+        self.doses: dict[int, Dose] = {}
+        self.store = DoseStore()
+        # Bumped by every published change, so TickFrames can tell they are old
+        self.version = 0
+        self._expiry = ExpiryIndex()
+        self._onsets = OnsetCounter()
+        # Ticks on other threads may advance _onsets under the read side
+        self._onsets_lock = threading.Lock()
+        self._journal = journal
+        self._journal_ids: dict[int, int] = {}
+        self._subscribers: list[weakref.WeakMethod] = []
+        self._metric_labels = labels = {"collection": str(next(self._ids))}
+        self._status_gauges = [
+            registry.gauge("dose_collection.doses", status=status.name, **labels)
+            for status in DoseStatus
+        ]
+        weakref.finalize(self, registry.remove_gauges, **labels)
+        if journal is not None:
+            self._onsets.advance(time.time())
+            for journal_id, dose in journal.load().items():
+                self._journal_ids[self._track(dose)] = journal_id
+
+    def __len__(self):
+        return len(self.doses)
+
+    def subscribe(self, listener: Callable[[DoseEvent], None]):
+        """Calls the bound method ``listener`` with every later DoseEvent"""
+        with self.lock.write():
+            self._subscribers.append(weakref.WeakMethod(listener))
+
+    def _publish(self, event: DoseEvent):
+        self.version += 1
+        live = []
+        for ref in self._subscribers:
+            if (listener := ref()) is not None:
+                listener(event)
+                live.append(ref)
+        self._subscribers = live
+
+    def add(self, doses: Iterable[Dose]) -> list[int]:
+        """Tracks every dose in ``doses`` and returns their slots"""
+        with self.lock.write():
+            doses = tuple(doses)
+            # Doses already past their onset then need no heap entry
+            self._onsets.advance(time.time())
+            slots = []
+            for dose in doses:
+                slot = self._track(dose)
+                if self._journal is not None:
+                    self._journal_ids[slot] = self._journal.add(dose)
+                slots.append(slot)
+            self._publish(DoseEvent("add", tuple(slots), doses))
+            return slots
+
+    def reset(self, slot: int, dose: Dose) -> Dose | None:
+        """Restarts ``dose`` in ``slot`` from now and returns the new dose, or
+        None if the slot no longer holds ``dose``"""
+        with self.lock.write():
+            if dose is None or self.doses.get(slot) is not dose:
+                return None
+            self.doses[slot] = new = dose.now_from_this()
+            self._expiry.add(slot, new.active_end)
+            self._onsets.add(slot, new.onset_end)
+            self.store.replace(slot, new)
+            if self._journal is not None:
+                self._journal.reset(self._journal_ids[slot], new)
+            self._publish(DoseEvent("reset", (slot,), (new,)))
+            return new
+
+    def remove(self, doses: Iterable[tuple[int, Dose]], op: str = "delete"):
+        """Drops the (slot, dose) pairs in ``doses`` in one pass, recording
+        them in the journal as ``op``. Pairs whose slot was removed already,
+        or now holds another dose, are skipped."""
+        with self.lock.write():
+            current = self.doses
+            slots = tuple(
+                dict.fromkeys(slot for slot, dose in doses if current.get(slot) is dose)
+            )
+            self._expiry.discard_many(slots)
+            self._drop(slots, op)
+
+    def remove_expired(
+        self, at: DateTime | float = None, op: str = "clear"
+    ) -> list[int]:
+        """Removes every dose that has expired by ``at`` and returns the slots"""
+        with self.lock.write():
+            slots = self._expiry.pop_expired(at)
+            self._drop(tuple(slots), op)
+            return slots
+
+    def _drop(self, slots: tuple[int, ...], op: str):
+        """Removes ``slots``, which are already out of the expiry index"""
+        for slot in slots:
+            del self.doses[slot]
+            self._onsets.discard(slot)
+            if self._journal is not None:
+                self._journal.delete(self._journal_ids.pop(slot), op)
+        self.store.remove_many(slots)
+        if slots:
+            self._publish(DoseEvent(op, slots))
+
+    def count_expired(self, at: DateTime | float = None) -> int:
+        with self.lock.read():
+            return self._expiry.count_expired(at)
+
+    def next_expiry(self, at: DateTime | float = None) -> float | None:
+        with self.lock.read():
+            return self._expiry.next_expiry(at)
+
+    def frame(self, at: float, frames: dict = None) -> TickFrame:
+        """The TickFrame for ``at``, reusing the one cached in ``frames`` (as
+        handed to views by the Ticker for one pass) unless the collection
+        changed since it was made"""
+        frame = None if frames is None else frames.get(self)
+        if frame is None or frame.at != at or frame.version != self.version:
+            frame = TickFrame(self, at)
+            if frames is not None:
+                frames[self] = frame
+            self._publish_counts(frame)
+        return frame
+
+    def _publish_counts(self, frame: TickFrame):
+        with self._onsets_lock:
+            processing = self._onsets.advance(frame.at)
+        expired = frame.count_expired()
+        counts = (processing, len(self.doses) - processing - expired, expired)
+        for gauge, n in zip(self._status_gauges, counts):
+            gauge.set(n)
+
+    def _track(self, dose: Dose) -> int:
+        slot = self.store.add(dose)
+        self.doses[slot] = dose
+        self._expiry.add(slot, dose.active_end)
+        self._onsets.add(slot, dose.onset_end)
+        return slot
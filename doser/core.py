@@ -0,0 +1,170 @@
+from enum import Enum
+from functools import lru_cache
+from typing import NamedTuple
+
+from pendulum import DateTime, Duration, from_timestamp, get_locale, Period
+
+from doser.utils import epoch
+
+
+class DoseStatus(Enum):
+    processing = "PROCESSING"
+    active = "ACTIVE"
+    expired = "EXPIRED"
+
+
+class IngestionMethod(NamedTuple):
+    name: str
+    onset: Duration
+    duration: Duration
+
+
+DRY_HERB = IngestionMethod("Dry Herb", Duration(minutes=15), Duration(hours=2))
+EDIBLE = IngestionMethod("Edible", Duration(hours=2), Duration(hours=6))
+FAKE_TEST_INGEST = IngestionMethod("TEST", Duration(seconds=15), Duration(seconds=15))
+
+
+@lru_cache(maxsize=4096)
+def _words(seconds: int, locale: str) -> str:
+    return Duration(seconds=seconds).in_words(locale)
+
+
+def time_left_words(left: float, locale: str = None) -> str:
+    """``Duration(seconds=left).in_words(locale)``, cached by whole second.
+
+    ``in_words`` drops fractions of a second once there is at least one whole
+    second, so every ``left`` in the same whole second shares one label.
+    """
+    if left < 1:
+        return Duration(seconds=left).in_words(locale)
+    return _words(int(left), locale or get_locale())
+
+
+# How far past a whole second of time left a label change is scheduled
+LABEL_EPSILON = 1e-3
+
+
+def label_wait(left):
+    """Seconds until the ``time_left_words`` label for ``left`` seconds next
+    changes, while at least a second is left; works on arrays too.
+
+    The label floors to the second, so it only changes once ``left`` drops
+    below the whole second it shows, i.e. just after the boundary.
+    """
+    return left % 1 + LABEL_EPSILON
+
+
+def next_label_change(end: float, at: float) -> float:
+    """When the ``time_left_words`` label counting down to ``end`` next
+    changes, as seen at ``at``"""
+    left = end - at
+    return at + label_wait(left) if left >= 1 else end
+
+
+class Dose(NamedTuple):
+    """A dose, with its boundaries kept as epoch seconds.
+
+    Pendulum objects are only built on demand by the ``ingested_at``,
+    ``processing_time`` and ``active_time`` properties, for presentation.
+    """
+
+    strain: str
+    method: IngestionMethod
+    ingested: float
+    onset_end: float
+    active_end: float
+
+    @classmethod
+    def new(
+        cls,
+        strain: str,
+        method: IngestionMethod,
+        ingested: DateTime | float = None,
+    ):
+        # Rounded to the microsecond so boundaries survive the trip through
+        # from_timestamp() exactly
+        ingested = round(epoch(ingested), 6)
+        onset_end = round(ingested + method.onset.total_seconds(), 6)
+        return cls(
+            strain,
+            method,
+            ingested,
+            onset_end,
+            round(onset_end + method.duration.total_seconds(), 6),
+        )
+
+    def now_from_this(self):
+        """Returns a new Dose that was taken now"""
+        return self.new(self.strain, self.method)
+
+    @property
+    def ingested_at(self) -> DateTime:
+        return from_timestamp(self.ingested)
+
+    @property
+    def processing_time(self) -> Period:
+        return Period(self.ingested_at, from_timestamp(self.onset_end))
+
+    @property
+    def active_time(self) -> Period:
+        return Period(from_timestamp(self.onset_end), from_timestamp(self.active_end))
+
+    @property
+    def status(self):
+        return self.status_at()
+
+    @property
+    def current_period(self) -> Period | None:
+        return self.current_period_at()
+
+    @property
+    def prog_value(self) -> float:
+        return self.prog_value_at()
+
+    @property
+    def time_left(self) -> str:
+        return self.time_left_at()
+
+    def status_at(self, at: DateTime | float = None) -> DoseStatus:
+        """Status at ``at`` (default now). Periods are half-open, so a dose is
+        active from the instant processing ends."""
+        at = epoch(at)
+        if at < self.onset_end:
+            return DoseStatus.processing
+        elif at < self.active_end:
+            return DoseStatus.active
+        else:
+            return DoseStatus.expired
+
+    def current_period_at(self, at: DateTime | float = None) -> Period | None:
+        match self.status_at(at):
+            case DoseStatus.processing:
+                return self.processing_time
+            case DoseStatus.active:
+                return self.active_time
+            case DoseStatus.expired:
+                return None
+
+    def prog_value_at(self, at: DateTime | float = None) -> float:
+        return self.state_at(at).prog_value
+
+    def time_left_at(self, at: DateTime | float = None) -> str:
+        return self.state_at(at).time_left
+
+    def state_at(self, at: DateTime | float = None) -> "DoseState":
+        """Status, progress and time left, all computed from one clock read"""
+        at = epoch(at)
+        if at < self.onset_end:
+            status, start, end = DoseStatus.processing, self.ingested, self.onset_end
+        elif at < self.active_end:
+            status, start, end = DoseStatus.active, self.onset_end, self.active_end
+        else:
+            return DoseState(DoseStatus.expired, 1, "Expired")
+        left = end - at
+        return DoseState(status, left / (end - start), time_left_words(left))
+
+
+class DoseState(NamedTuple):
+    status: DoseStatus
+    prog_value: float
+    time_left: str
@@ -0,0 +1,102 @@
+"""Prometheus text exposition of a MetricsRegistry over HTTP.
+
+Scrapes only read the registry's own pre-aggregated values, so they never
+contend with the dose managers being measured.
+"""
+
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from doser.metrics import Labels, MetricsRegistry, registry as default_registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "doser_"
+
+
+def metric_name(name: str, suffix: str = "") -> str:
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name) + suffix
+
+
+def _labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def exposition(registry: MetricsRegistry = default_registry) -> str:
+    """The registry in Prometheus text format.
+
+    Histograms are exposed as summaries (p50/p95/p99 plus ``_sum`` and
+    ``_count``) with a separate ``_max`` gauge, in seconds.
+    """
+    lines = []
+    for name, s in registry.snapshot().items():
+        metric = metric_name(name, "_seconds")
+        lines.append(f"# TYPE {metric} summary")
+        for q, value in (("0.5", s.p50), ("0.95", s.p95), ("0.99", s.p99)):
+            lines.append(f'{metric}{{quantile="{q}"}} {value!r}')
+        lines.append(f"{metric}_sum {s.total!r}")
+        lines.append(f"{metric}_count {s.count}")
+        lines.append(f"# TYPE {metric}_max gauge")
+        lines.append(f"{metric}_max {s.max!r}")
+
+    typed = set()
+    for kind, suffix, values in (
+        ("counter", "_total", registry.counters()),
+        ("gauge", "", registry.gauges()),
+    ):
+        for (name, labels), value in values.items():
+            metric = metric_name(name, suffix)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric}{_labels(labels)} {value!r}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves ``exposition(registry)`` at ``/metrics`` from a daemon thread"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int,
+        host: str = "127.0.0.1",
+        registry: MetricsRegistry = default_registry,
+    ):
+        self.registry = registry
+        super().__init__((host, port), _Handler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MetricsServer
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = exposition(self.server.registry).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,184 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from os import PathLike
+from typing import NamedTuple
+
+from pendulum import Duration, now
+
+from doser.core import Dose, IngestionMethod
+from doser.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY,
+    at REAL NOT NULL,
+    op TEXT NOT NULL,
+    dose_id INTEGER NOT NULL,
+    strain TEXT,
+    method TEXT,
+    onset REAL,
+    duration REAL,
+    ingested REAL
+);
+CREATE INDEX IF NOT EXISTS journal_ingested ON journal (ingested);
+CREATE INDEX IF NOT EXISTS journal_strain ON journal (strain);
+CREATE INDEX IF NOT EXISTS journal_dose_id ON journal (dose_id);
+"""
+
+INSERT = """
+INSERT INTO journal (at, op, dose_id, strain, method, onset, duration, ingested)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_CLOSE = object()
+
+
+class JournalEntry(NamedTuple):
+    at: float
+    op: str
+    dose_id: int
+    strain: str | None = None
+    method: str | None = None
+    onset: float | None = None
+    duration: float | None = None
+    ingested: float | None = None
+
+    @classmethod
+    def for_dose(cls, op: str, dose_id: int, dose: Dose):
+        return cls(
+            now("utc").timestamp(),
+            op,
+            dose_id,
+            dose.strain,
+            dose.method.name,
+            dose.method.onset.total_seconds(),
+            dose.method.duration.total_seconds(),
+            dose.ingested,
+        )
+
+
+class DoseJournal:
+    """Append-only SQLite log of dose changes.
+
+    Writes are queued and committed by a background thread in batched
+    transactions, so recording a change never waits on the disk. The database
+    runs in WAL mode with ``synchronous=NORMAL``. A batch that fails to commit
+    is logged, counted as ``journal.dropped`` and skipped.
+    """
+
+    flush_interval = 0.25
+
+    def __init__(self, path: str | PathLike, flush_interval: float = None):
+        self.path = path
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript(SCHEMA)
+                query = "SELECT MAX(dose_id) FROM journal"
+                (last_id,) = conn.execute(query).fetchone()
+        finally:
+            conn.close()
+        self._next_id = (last_id or 0) + 1
+        self._id_lock = threading.Lock()
+        self._queue: queue.Queue[JournalEntry | object] = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._writer, daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self) -> dict[int, Dose]:
+        """Replays the journal and returns the live doses by id, oldest first"""
+        return self._replay()[0]
+
+    def archived(self) -> dict[int, Dose]:
+        """Replays the journal and returns the archived doses by id, in the
+        order they were archived"""
+        return self._replay()[1]
+
+    def _replay(self) -> tuple[dict[int, Dose], dict[int, Dose]]:
+        doses, archived = {}, {}
+        conn = self._connect()
+        try:
+            for entry in map(
+                JournalEntry._make,
+                conn.execute(
+                    "SELECT at, op, dose_id, strain, method, onset, duration,"
+                    " ingested FROM journal ORDER BY seq"
+                ),
+            ):
+                if entry.op in ("add", "reset"):
+                    method = IngestionMethod(
+                        entry.method,
+                        Duration(seconds=entry.onset),
+                        Duration(seconds=entry.duration),
+                    )
+                    doses[entry.dose_id] = Dose.new(
+                        entry.strain, method, entry.ingested
+                    )
+                elif (dose := doses.pop(entry.dose_id, None)) and entry.op == "archive":
+                    archived[entry.dose_id] = dose
+        finally:
+            conn.close()
+        return doses, archived
+
+    def add(self, dose: Dose) -> int:
+        """Records a new dose and returns its journal id"""
+        with self._id_lock:
+            dose_id = self._next_id
+            self._next_id += 1
+        self._queue.put(JournalEntry.for_dose("add", dose_id, dose))
+        return dose_id
+
+    def reset(self, dose_id: int, dose: Dose):
+        self._queue.put(JournalEntry.for_dose("reset", dose_id, dose))
+
+    def delete(self, dose_id: int, op: str = "delete"):
+        self._queue.put(JournalEntry(now("utc").timestamp(), op, dose_id))
+
+    def flush(self):
+        """Blocks until everything recorded so far has been committed"""
+        self._queue.join()
+
+    def close(self):
+        if self._writer_thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._writer_thread.join()
+        atexit.unregister(self.close)
+
+    def _writer(self):
+        conn = self._connect()
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while _CLOSE not in batch and (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            closing = _CLOSE in batch
+            entries = [e for e in batch if e is not _CLOSE]
+            try:
+                with conn:
+                    conn.executemany(INSERT, entries)
+            except sqlite3.Error:
+                # Losing one batch beats losing the writer and hanging flush
+                logger.exception("Dropped %d journal entries", len(entries))
+                registry.counter("journal.dropped").inc(len(entries))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
@@ -0,0 +1,188 @@
+import asyncio
+import sys
+import threading
+import time
+
+from doser.metrics import MetricsRegistry, registry as default_registry
+
+
+def _owner() -> tuple[object, int]:
+    """Who is acquiring: the running asyncio task, or else the thread; and
+    the thread either way"""
+    thread = threading.get_ident()
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return (thread if task is None else task), thread
+
+
+class RWLock:
+    """Reader-writer lock: any number of readers or a single writer.
+
+    Reentrant per asyncio task, or per thread outside of one. A writer may
+    take either side again, and a reader may read again even while a writer is
+    waiting, but a reader cannot upgrade to writing. New readers queue behind
+    waiting writers so writers are not starved.
+
+    Tasks on one event loop share its thread, so they cannot wait for each
+    other: the holder could never resume to release. Locked sections must not
+    await, and an acquisition that would have to wait on another task of the
+    same thread raises RuntimeError instead of hanging the loop. It follows
+    that readers on one loop never actually overlap, and waits only measure
+    contention with other threads, e.g. a metrics scrape.
+
+    ``read`` and ``write`` record how long the outermost acquisition waited
+    and how long it was held, as ``<name>.<site>.<mode>_wait`` and
+    ``<name>.<site>.<mode>_hold`` histograms. ``site`` defaults to the
+    calling function's name (``co_name``; ``co_qualname`` needs 3.11).
+    """
+
+    def __init__(self, name: str, metrics: MetricsRegistry = default_registry):
+        self.name = name
+        self.metrics = metrics
+        # The fast paths only take the mutex; the condition is only waited on
+        # and notified when some thread actually has to block
+        self._mutex = threading.Lock()
+        self._cond = threading.Condition(self._mutex)
+        # Read depth by owner, see _owner
+        self._readers: dict[object, int] = {}
+        self._writer: object | None = None
+        self._writer_depth = 0
+        # How many owners hold either side, by thread
+        self._holders: dict[int, int] = {}
+        self._readers_waiting = 0
+        self._writers_waiting = 0
+        self._names: dict[tuple[str, bool], tuple[str, str]] = {}
+
+    def read(self, site: str = None) -> "_Hold":
+        """Context manager holding the lock shared"""
+        return _Hold(self, False, site or sys._getframe(1).f_code.co_name)
+
+    def write(self, site: str = None) -> "_Hold":
+        """Context manager holding the lock exclusively"""
+        return _Hold(self, True, site or sys._getframe(1).f_code.co_name)
+
+    def _metric_names(self, site: str, exclusive: bool) -> tuple[str, str]:
+        key = (site, exclusive)
+        if (names := self._names.get(key)) is None:
+            prefix = f"{self.name}.{site}.{'write' if exclusive else 'read'}"
+            names = self._names[key] = (f"{prefix}_wait", f"{prefix}_hold")
+        return names
+
+    def _check_can_wait(self, thread: int):
+        if self._holders.get(thread):
+            raise RuntimeError(
+                f"{self.name}: held by another task on this thread, across an await"
+            )
+
+    def _hold(self, thread: int):
+        self._holders[thread] = self._holders.get(thread, 0) + 1
+
+    def _unhold(self, thread: int):
+        if holders := self._holders[thread] - 1:
+            self._holders[thread] = holders
+        else:
+            del self._holders[thread]
+
+    def _acquire_read(self, me: object, thread: int) -> bool:
+        """Returns whether ``me`` did not already hold the lock"""
+        with self._mutex:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return False
+            if self._writer is not None or self._writers_waiting:
+                self._check_can_wait(thread)
+                self._readers_waiting += 1
+                try:
+                    while self._writer is not None or self._writers_waiting:
+                        self._cond.wait()
+                finally:
+                    self._readers_waiting -= 1
+            self._readers[me] = 1
+            self._hold(thread)
+            return True
+
+    def _release_read(self, me: object, thread: int):
+        with self._mutex:
+            if depth := self._readers[me] - 1:
+                self._readers[me] = depth
+            else:
+                del self._readers[me]
+                if self._writer != me:
+                    self._unhold(thread)
+                if not self._readers and self._writers_waiting:
+                    self._cond.notify_all()
+
+    def _acquire_write(self, me: object, thread: int) -> bool:
+        with self._mutex:
+            if self._writer == me:
+                self._writer_depth += 1
+                return False
+            if me in self._readers:
+                raise RuntimeError(f"{self.name}: cannot upgrade a read to a write")
+            if self._writer is not None or self._readers:
+                self._check_can_wait(thread)
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+            self._hold(thread)
+            return True
+
+    def _release_write(self, thread: int):
+        with self._mutex:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._unhold(thread)
+                if self._writers_waiting or self._readers_waiting:
+                    self._cond.notify_all()
+
+
+class _Hold:
+    """One acquisition of an RWLock, timed when metrics are enabled"""
+
+    __slots__ = (
+        "_lock",
+        "_exclusive",
+        "_site",
+        "_owner",
+        "_start",
+        "_acquired",
+        "_outermost",
+    )
+
+    def __init__(self, lock: RWLock, exclusive: bool, site: str):
+        self._lock = lock
+        self._exclusive = exclusive
+        self._site = site
+
+    def __enter__(self):
+        lock = self._lock
+        timed = lock.metrics.enabled
+        self._start = time.perf_counter() if timed else None
+        self._owner = owner = _owner()
+        if self._exclusive:
+            self._outermost = lock._acquire_write(*owner)
+        else:
+            self._outermost = lock._acquire_read(*owner)
+        if timed:
+            self._acquired = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        lock = self._lock
+        me, thread = self._owner
+        if self._exclusive:
+            lock._release_write(thread)
+        else:
+            lock._release_read(me, thread)
+        if self._outermost and self._start is not None:
+            held = time.perf_counter() - self._acquired
+            wait, hold = lock._metric_names(self._site, self._exclusive)
+            lock.metrics.histogram(wait).record(self._acquired - self._start)
+            lock.metrics.histogram(hold).record(held)
@@ -0,0 +1,228 @@
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, NamedTuple
+
+# Sub-buckets per power of two, as a bit count: 2**7 gives under 1% error
+PRECISION_BITS = 7
+
+
+class HistogramSnapshot(NamedTuple):
+    count: int
+    total: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class Histogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Durations are recorded in integer nanoseconds into buckets that are exact
+    below ``2 ** PRECISION_BITS`` ns and split every power of two above that
+    into ``2 ** (PRECISION_BITS - 1)`` linear sub-buckets, so percentiles are
+    within 1% of the true value while recording stays O(1).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[int, int] = {}
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    @staticmethod
+    def _bucket(ns: int) -> int:
+        if (shift := ns.bit_length() - PRECISION_BITS) <= 0:
+            return ns
+        return (shift << PRECISION_BITS) + (ns >> shift)
+
+    @staticmethod
+    def _bucket_value(bucket: int) -> float:
+        """Midpoint of ``bucket`` in nanoseconds"""
+        shift, sub = divmod(bucket, 1 << PRECISION_BITS)
+        if shift == 0:
+            return sub
+        return (sub << shift) + (1 << shift) / 2
+
+    def record(self, seconds: float):
+        if (ns := int(seconds * 1e9)) < 0:
+            ns = 0
+        # _bucket, inlined: this runs on every timed call and lock hold
+        if (shift := ns.bit_length() - PRECISION_BITS) <= 0:
+            bucket = ns
+        else:
+            bucket = (shift << PRECISION_BITS) + (ns >> shift)
+        counts = self._counts
+        with self._lock:
+            counts[bucket] = counts.get(bucket, 0) + 1
+            self._count += 1
+            self._total += ns
+            if ns > self._max:
+                self._max = ns
+
+    def snapshot(self) -> HistogramSnapshot:
+        with self._lock:
+            counts = sorted(self._counts.items())
+            count, total, max_ns = self._count, self._total, self._max
+        quantiles = []
+        for q in (0.5, 0.95, 0.99):
+            rank, seen = q * count, 0
+            for bucket, n in counts:
+                seen += n
+                if seen >= rank:
+                    quantiles.append(min(self._bucket_value(bucket), max_ns) / 1e9)
+                    break
+            else:
+                quantiles.append(0.0)
+        return HistogramSnapshot(count, total / 1e9, *quantiles, max_ns / 1e9)
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class MetricsRegistry:
+    """Named latency histograms, counters and gauges.
+
+    While ``enabled`` is False, ``timed`` functions call straight through and
+    ``time`` hands back a shared no-op context manager, so instrumentation
+    costs one attribute check.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = {}
+        self._counters: dict[tuple[str, Labels], Counter] = {}
+        self._gauges: dict[tuple[str, Labels], Gauge] = {}
+
+    def histogram(self, name: str) -> Histogram:
+        if (histogram := self._histograms.get(name)) is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def record(self, name: str, seconds: float):
+        if self.enabled:
+            self.histogram(name).record(seconds)
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        if (counter := self._counters.get(key)) is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+        return counter
+
+    def gauge(self, name: str, **labels: str) -> Gauge:
+        key = (name, tuple(sorted(labels.items())))
+        if (gauge := self._gauges.get(key)) is None:
+            with self._lock:
+                gauge = self._gauges.setdefault(key, Gauge())
+        return gauge
+
+    def remove_gauges(self, **labels: str):
+        """Drops every gauge carrying all of ``labels``"""
+        wanted = set(labels.items())
+        with self._lock:
+            for key in [k for k in self._gauges if wanted <= set(k[1])]:
+                del self._gauges[key]
+
+    @contextmanager
+    def _timing(self, histogram: Histogram):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.record(time.perf_counter() - start)
+
+    def time(self, name: str):
+        """Context manager recording the duration of its body under ``name``"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timing(self.histogram(name))
+
+    def timed(self, name: str | Callable = None):
+        """Decorator recording each call's duration under ``name`` (default the
+        function's qualified name). Return values pass through unchanged and
+        coroutine functions are timed until they complete.
+
+        Usable bare (``@timed``) or with a name (``@timed("tick")``).
+        """
+        if callable(name):
+            return self.timed()(name)
+
+        def decorator(f):
+            histogram_name = name or f"{f.__module__}.{f.__qualname__}"
+
+            if inspect.iscoroutinefunction(f):
+
+                @wraps(f)
+                async def inner(*args, **kwargs):
+                    if not self.enabled:
+                        return await f(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        return await f(*args, **kwargs)
+                    finally:
+                        self.record(histogram_name, time.perf_counter() - start)
+
+            else:
+
+                @wraps(f)
+                def inner(*args, **kwargs):
+                    if not self.enabled:
+                        return f(*args, **kwargs)
+                    start = time.perf_counter()
+                    try:
+                        return f(*args, **kwargs)
+                    finally:
+                        self.record(histogram_name, time.perf_counter() - start)
+
+            return inner
+
+        return decorator
+
+    def snapshot(self) -> dict[str, HistogramSnapshot]:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: h.snapshot() for name, h in sorted(histograms.items())}
+
+    def counters(self) -> dict[tuple[str, Labels], float]:
+        with self._lock:
+            return {key: c.value for key, c in sorted(self._counters.items())}
+
+    def gauges(self) -> dict[tuple[str, Labels], float]:
+        with self._lock:
+            return {key: g.value for key, g in sorted(self._gauges.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+registry = MetricsRegistry(enabled=os.environ.get("DOSER_METRICS", "1") != "0")
+timed = registry.timed
@@ -0,0 +1,169 @@
+import bisect
+import heapq
+from itertools import compress, count
+from math import inf
+from typing import Hashable, Iterable
+
+from pendulum import DateTime
+
+from doser.utils import epoch
+
+
+class ExpiryIndex:
+    """Tracked keys ordered by when their dose expires.
+
+    Counting and popping the expired prefix are binary searches over a sorted
+    list of ``active_end`` values, so they never look at live doses.
+    """
+
+    # Beyond this many keys, discard_many rebuilds the lists instead of
+    # shifting them once per key
+    in_place_limit = 64
+
+    def __init__(self):
+        self._ends: list[float] = []
+        self._keys: list[Hashable] = []
+        self._end_of: dict[Hashable, float] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: Hashable, active_end: float):
+        """Indexes ``key``, replacing any earlier expiry"""
+        self.discard(key)
+        i = bisect.bisect_right(self._ends, active_end)
+        self._ends.insert(i, active_end)
+        self._keys.insert(i, key)
+        self._end_of[key] = active_end
+
+    def discard(self, key: Hashable):
+        if (end := self._end_of.pop(key, None)) is not None:
+            self._remove(key, end)
+
+    def discard_many(self, keys: Iterable[Hashable]):
+        """Discards ``keys``, rebuilding the index in one pass when there are
+        too many for deleting each in place to be cheaper"""
+        ends = {k: e for k in keys if (e := self._end_of.pop(k, None)) is not None}
+        if len(ends) <= self.in_place_limit:
+            for key, end in ends.items():
+                self._remove(key, end)
+        else:
+            kept = [key not in ends for key in self._keys]
+            self._ends = list(compress(self._ends, kept))
+            self._keys = list(compress(self._keys, kept))
+
+    def _remove(self, key: Hashable, end: float):
+        i = bisect.bisect_left(self._ends, end)
+        while self._keys[i] != key:
+            i += 1
+        del self._ends[i]
+        del self._keys[i]
+
+    def count_expired(self, at: DateTime | float = None) -> int:
+        return bisect.bisect_right(self._ends, epoch(at))
+
+    def next_expiry(self, at: DateTime | float = None) -> float | None:
+        """When the next dose that is still live at ``at`` expires"""
+        k = self.count_expired(at)
+        return self._ends[k] if k < len(self._ends) else None
+
+    def pop_expired(self, at: DateTime | float = None) -> list[Hashable]:
+        """Removes and returns every key that has expired by ``at``"""
+        k = self.count_expired(at)
+        expired = self._keys[:k]
+        del self._ends[:k]
+        del self._keys[:k]
+        for key in expired:
+            del self._end_of[key]
+        return expired
+
+
+class OnsetCounter:
+    """How many tracked keys are still processing, as of the latest instant
+    it was advanced to.
+
+    Keys whose ``onset_end`` is still ahead sit in a min-heap; advancing pops
+    the ones it passes, so reading the count never looks at every dose.
+    Discarded keys are forgotten at once and their heap entries dropped
+    lazily.
+    """
+
+    def __init__(self):
+        self.at = -inf
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._seq = count()
+        # The heap entry that is current for each pending key
+        self._pending: dict[Hashable, int] = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key: Hashable, onset_end: float):
+        """Tracks ``key`` until ``onset_end``, replacing any earlier entry"""
+        if onset_end <= self.at:
+            self._pending.pop(key, None)
+            return
+        self._pending[key] = seq = next(self._seq)
+        heapq.heappush(self._heap, (onset_end, seq, key))
+
+    def discard(self, key: Hashable):
+        if self._pending.pop(key, None) is not None:
+            self._compact()
+
+    def advance(self, at: float) -> int:
+        """Moves up to ``at`` (never back) and returns how many keys are still
+        processing"""
+        if at > self.at:
+            self.at = at
+            heap, pending = self._heap, self._pending
+            while heap and heap[0][0] <= at:
+                _, seq, key = heapq.heappop(heap)
+                if pending.get(key) == seq:
+                    del pending[key]
+            self._compact()
+        return len(self._pending)
+
+    def _compact(self):
+        """Drops stale heap entries once they outnumber the pending keys"""
+        pending = self._pending
+        if len(self._heap) > 2 * len(pending) + 64:
+            self._heap = [e for e in self._heap if pending.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+
+
+class TickPacer:
+    """Turns ticker wake times into monotonic deadlines and throttles passes
+    that cannot keep up.
+
+    Deadlines are absolute, so a pass's own cost never shifts later ones. A
+    pass that finishes after the deadline it asked for has overrun; its missed
+    frames are not replayed, since the next pass renders whatever is due by
+    then. The minimum gap between passes doubles (up to ``max_interval``)
+    whenever a pass takes more than ``budget`` of it, and halves again (down to
+    ``min_interval``) once passes are cheap.
+    """
+
+    min_interval = 1 / 60
+    max_interval = 2.0
+    budget = 0.5
+
+    def __init__(self):
+        self.interval = self.min_interval
+
+    def next_deadline(
+        self, started: float, finished: float, deadline: float | None
+    ) -> tuple[float | None, float]:
+        """Paces the pass that ran from ``started`` to ``finished`` and wants
+        to run again at ``deadline`` (all monotonic seconds).
+
+        Returns when the next pass should start and how late the requested
+        deadline already was when the pass finished (0 if it was not).
+        """
+        cost = finished - started
+        if cost > self.interval * self.budget:
+            self.interval = min(self.interval * 2, self.max_interval)
+        elif cost * 4 < self.interval * self.budget:
+            self.interval = max(self.interval / 2, self.min_interval)
+        if deadline is None:
+            return None, 0.0
+        return max(deadline, started + self.interval), max(finished - deadline, 0.0)
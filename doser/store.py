@@ -0,0 +1,163 @@
+from typing import NamedTuple, Sequence, TYPE_CHECKING
+
+import numpy as np
+from pendulum import DateTime
+
+from doser.core import label_wait
+from doser.utils import epoch
+
+if TYPE_CHECKING:
+    from doser.core import Dose, IngestionMethod
+
+# Status codes as returned by DoseStore.evaluate, in DoseStatus order
+PROCESSING, ACTIVE, EXPIRED = range(3)
+
+
+class StoreState(NamedTuple):
+    slots: np.ndarray
+    status: np.ndarray
+    progress: np.ndarray
+    remaining: np.ndarray
+    period: np.ndarray
+
+
+class DoseStore:
+    """Columnar copy of tracked doses for vectorized evaluation.
+
+    Doses live in slots that stay stable for as long as the dose is stored;
+    freed slots are reused by later ``add`` calls. Times are kept as epoch
+    seconds so evaluating every dose is a handful of array operations.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._ingested = np.zeros(capacity, dtype=np.float64)
+        self._onset = np.zeros(capacity, dtype=np.float64)
+        self._duration = np.zeros(capacity, dtype=np.float64)
+        self._onset_end = np.zeros(capacity, dtype=np.float64)
+        self._active_end = np.zeros(capacity, dtype=np.float64)
+        self._method_id = np.full(capacity, -1, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._free: list[int] = list(range(capacity - 1, -1, -1))
+        self._methods: list["IngestionMethod"] = []
+        self._method_ids: dict["IngestionMethod", int] = {}
+
+    def __len__(self):
+        return int(self._alive.sum())
+
+    @property
+    def capacity(self) -> int:
+        return len(self._alive)
+
+    def _grow(self):
+        old = self.capacity
+        new = old * 2
+        for name in (
+            "_ingested",
+            "_onset",
+            "_duration",
+            "_onset_end",
+            "_active_end",
+            "_method_id",
+            "_alive",
+        ):
+            column = getattr(self, name)
+            grown = np.zeros(new, dtype=column.dtype)
+            grown[:old] = column
+            setattr(self, name, grown)
+        self._method_id[old:] = -1
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def method(self, method_id: int) -> "IngestionMethod":
+        return self._methods[method_id]
+
+    def _method_id_for(self, method: "IngestionMethod") -> int:
+        if (method_id := self._method_ids.get(method)) is None:
+            method_id = self._method_ids[method] = len(self._methods)
+            self._methods.append(method)
+        return method_id
+
+    def add(self, dose: "Dose") -> int:
+        """Stores ``dose`` and returns its slot"""
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.replace(slot, dose)
+        return slot
+
+    def replace(self, slot: int, dose: "Dose"):
+        self._ingested[slot] = dose.ingested
+        self._onset[slot] = dose.method.onset.total_seconds()
+        self._duration[slot] = dose.method.duration.total_seconds()
+        self._onset_end[slot] = dose.onset_end
+        self._active_end[slot] = dose.active_end
+        self._method_id[slot] = self._method_id_for(dose.method)
+        self._alive[slot] = True
+
+    def remove(self, slot: int):
+        if self._alive[slot]:
+            self._alive[slot] = False
+            self._method_id[slot] = -1
+            self._free.append(slot)
+
+    def remove_many(self, slots: Sequence[int]):
+        slots = np.unique(np.asarray(slots, dtype=np.intp))
+        slots = slots[self._alive[slots]]
+        self._alive[slots] = False
+        self._method_id[slots] = -1
+        self._free.extend(slots.tolist())
+
+    def slots(self) -> np.ndarray:
+        return np.flatnonzero(self._alive)
+
+    def evaluate(
+        self, at: DateTime | float = None, slots: Sequence[int] = None
+    ) -> StoreState:
+        """Status codes, progress fractions and seconds remaining at ``at``.
+
+        ``slots`` defaults to every stored dose. Progress and remaining time are
+        relative to the current period, as with ``Dose.state_at``.
+        """
+        t = epoch(at)
+        slots = self.slots() if slots is None else np.asarray(slots, dtype=np.intp)
+        onset = self._onset[slots]
+        duration = self._duration[slots]
+        onset_end = self._onset_end[slots]
+        active_end = self._active_end[slots]
+
+        status = (t >= onset_end).astype(np.int8) + (t >= active_end)
+        processing = status == PROCESSING
+        remaining = np.where(processing, onset_end, active_end) - t
+        period = np.where(processing, onset, duration)
+        expired = status == EXPIRED
+        remaining[expired] = 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            progress = np.where(expired, 1.0, remaining / period)
+        return StoreState(slots, status, progress, remaining, period)
+
+    def next_change(
+        self,
+        at: DateTime | float = None,
+        slots: Sequence[int] = None,
+        progress_steps: int = 200,
+        state: StoreState = None,
+    ) -> np.ndarray:
+        """Epoch seconds at which each dose next looks different on screen.
+
+        That is the earliest of its next status boundary, the next whole second
+        of its time-left label (which ``in_words`` renders to the second) and
+        the next step of its progress value rounded to ``progress_steps``.
+        Expired doses never change again and get ``inf``. Callers that already
+        have ``evaluate(at, slots)`` can pass it as ``state``.
+        """
+        t = epoch(at)
+        if state is None:
+            state = self.evaluate(t, slots)
+        left = state.remaining
+        # Under a second left label_wait overshoots left, which then wins
+        label = label_wait(left)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            quantum = state.period / progress_steps
+            progress = left - (np.round(left / quantum) - 0.5) * quantum
+        progress = np.where(progress > 0, progress, progress + quantum)
+        wait = np.fmin(np.fmin(label, progress), left)
+        return np.where(state.status == EXPIRED, np.inf, t + wait)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Protocol
+
+from doser.metrics import registry, timed
+from doser.scheduler import TickPacer
+
+logger = logging.getLogger(__name__)
+
+
+class Tickable(Protocol):
+    async def tick(self, at: float = None, frames: dict = None) -> float | None: ...
+
+
+class Ticker:
+    """A single ticker task driving every registered view.
+
+    Each pass reads the clock once and ticks every view against that reading,
+    so time-derived state (statuses, labels, the ``time_left_words`` cache) is
+    worked out once per instant and each view only sends its own diff. Every
+    view in a pass also gets the same ``frames`` dict to cache state that is
+    not theirs alone, such as one TickFrame per shared collection. A pass only
+    works out and queues each view's diff; views send to their clients from
+    their own tasks, so a slow client holds up neither the other views nor
+    the pass, and the pacer times the pass without any client I/O.
+    The task starts with the first registered view and stops with the last.
+    """
+
+    def __init__(self):
+        self._views: set[Tickable] = set()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.pacer = TickPacer()
+
+    def __len__(self):
+        return len(self._views)
+
+    def register(self, view: Tickable):
+        self._views.add(view)
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self.wake()
+
+    def unregister(self, view: Tickable):
+        self._views.discard(view)
+        if not self._views and self._task is not None:
+            self._task.cancel()
+            self._task = self._wake = None
+
+    def wake(self):
+        """Runs a pass as soon as the pacer allows, e.g. after a view's doses
+        changed"""
+        if self._wake is not None:
+            self._wake.set()
+
+    @timed("ticker.pass")
+    async def tick(self, at: float = None) -> float | None:
+        """Ticks every view at ``at`` (default now) and returns when the
+        earliest of them is next due"""
+        at = time.time() if at is None else at
+        views = list(self._views)
+        frames = {}
+        wakes = []
+        for view, result in zip(
+            views,
+            await asyncio.gather(
+                *(v.tick(at, frames) for v in views), return_exceptions=True
+            ),
+        ):
+            if isinstance(result, Exception):
+                logger.error("Ticker pass failed for %r", view, exc_info=result)
+                registry.counter("ticker.errors").inc()
+                wakes.append(at + self.pacer.max_interval)
+            elif result is not None:
+                wakes.append(result)
+        registry.gauge("ticker.views").set(len(views))
+        return min(wakes, default=None)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            at, started = time.time(), time.monotonic()
+            wake_at = await self.tick(at)
+            deadline, late = self.pacer.next_deadline(
+                started,
+                time.monotonic(),
+                None if wake_at is None else started + (wake_at - at),
+            )
+            if late:
+                registry.counter("ticker.overruns").inc()
+                registry.record("ticker.lateness", late)
+            registry.gauge("ticker.interval").set(self.pacer.interval)
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(),
+                    None if deadline is None else max(deadline - time.monotonic(), 0),
+                )
+            except asyncio.TimeoutError:
+                pass
+            else:
+                # Woken passes are paced like any other
+                if (delay := started + self.pacer.interval - time.monotonic()) > 0:
+                    await asyncio.sleep(delay)
+
+
+# The process-wide ticker shared by every session
+ticker = Ticker()
@@ -0,0 +1,650 @@
+import asyncio
+import logging
+import os
+from math import inf
+from functools import cache, partial
+from itertools import islice
+from types import MappingProxyType
+from typing import Iterable, Mapping, NamedTuple
+
+import flet
+from pendulum import DateTime, Duration, duration, now
+from flet import (
+    Column,
+    Control,
+    ControlEvent,
+    DataRow,
+    IconButton,
+    icons,
+    Markdown,
+    Radio,
+    RadioGroup,
+    Row,
+    Text,
+    TextField,
+    UserControl,
+    VerticalDivider,
+)
+
+from doser.collection import DoseCollection, DoseEvent
+from doser.core import (
+    Dose,
+    DoseState,
+    DoseStatus,
+    DRY_HERB,
+    EDIBLE,
+    FAKE_TEST_INGEST,
+    IngestionMethod,
+    time_left_words,
+)
+from doser.exporter import MetricsServer
+from doser.journal import DoseJournal
+from doser.metrics import registry, timed
+from doser.store import EXPIRED
+from doser.ticker import Ticker, ticker as shared_ticker
+from doser.utils import epoch
+
+logger = logging.getLogger(__name__)
+
+_STATUSES = tuple(DoseStatus)
+
+
+class RowView(NamedTuple):
+    status: str
+    time_left: str
+    progress: float
+    color: str
+
+
+class DoseRow(DataRow):
+    # Progress ring values are rounded to this many steps before diffing
+    progress_steps = 200
+
+    def __init__(
+        self,
+        dose: Dose,
+        delete: callable,
+        reset: callable,
+        slot: int = None,
+        select: callable = None,
+    ):
+        super().__init__(
+            on_select_changed=partial(select, self) if select is not None else None
+        )
+        self.dose = dose
+        self.slot = slot
+        self._rendered: RowView | None = None
+        self._status = flet.Text(str(dose.status.value))
+        self._status_time_remaining = flet.Text(dose.time_left)
+        self._status_progress_bar = flet.ProgressRing(value=1)
+        self._prog_col = flet.Row(
+            [self._status_time_remaining, self._status_progress_bar]
+        )
+        self.cells = [
+            flet.DataCell(flet.Text(dose.strain)),
+            flet.DataCell(flet.Text(dose.method.name)),
+            flet.DataCell(self._status),
+            flet.DataCell(self._prog_col),
+            flet.DataCell(
+                flet.Row(
+                    [
+                        flet.IconButton(
+                            flet.icons.DELETE_SWEEP, on_click=partial(delete, self)
+                        ),
+                        flet.IconButton(
+                            flet.icons.LOCK_RESET, on_click=partial(reset, self)
+                        ),
+                    ]
+                )
+            ),
+        ]
+
+    def update(self, state: DoseState = None) -> bool:
+        """Renders ``state`` (default now) and sends it to the client.
+
+        Nothing is sent when the row would look the same as it did after the
+        last update; returns whether an update was sent.
+        """
+        if changed := self.render(state):
+            super().update()
+        return changed
+
+    async def update_async(self, state: DoseState = None) -> bool:
+        if changed := self.render(state):
+            await super().update_async()
+        return changed
+
+    def render(self, state: DoseState = None) -> bool:
+        """Applies ``state`` to the row's controls without sending anything.
+
+        Returns whether any control changed, in which case the caller is
+        responsible for flushing the row, e.g. with ``page.update(*rows)``.
+        """
+        view = self.view(state or self.dose.state_at())
+        if view == self._rendered:
+            return False
+        self._status.value = view.status
+        self._status_time_remaining.value = view.time_left
+        self._status_progress_bar.value = view.progress
+        self._status_progress_bar.color = view.color
+        self._rendered = view
+        return True
+
+    def view(self, state: DoseState) -> RowView:
+        match state.status:
+            case DoseStatus.processing:
+                color = "Blue"
+            case DoseStatus.active:
+                color = "green"
+            case DoseStatus.expired:
+                color = "red"
+        steps = self.progress_steps
+        return RowView(
+            state.status.value,
+            state.time_left,
+            round(state.prog_value * steps) / steps,
+            color,
+        )
+
+    @property
+    def status(self) -> DoseStatus:
+        return self.dose.status
+
+
+class DoseManager(UserControl):
+    page_size = 50
+    # How long expired doses stay in the table before being archived; None
+    # keeps them until they are cleared by hand. Archiving removes them from
+    # the collection, so with a shared collection whichever view ticks first
+    # archives for every view, by the shortest retention among them. Archived
+    # doses can be read back with DoseJournal.archived(); without a journal,
+    # archiving is the same as deleting.
+    retention: Duration | None = None
+    table_column_names = (
+        "Strain",
+        "Ingestion Method",
+        "Status",
+        "Time til next status",
+        "Actions",
+    )
+
+    def __init__(
+        self,
+        journal: DoseJournal = None,
+        retention: Duration = None,
+        ticker: Ticker = None,
+        collection: DoseCollection = None,
+    ):
+        super().__init__()
+        if collection is None:
+            collection = DoseCollection(journal)
+        elif journal is not None:
+            raise ValueError("Pass either a journal or a collection, not both")
+        if retention is not None:
+            self.retention = retention
+        self._collection = collection
+        self._dose_lock = collection.lock
+        self._table = flet.DataTable(
+            columns=[flet.DataColumn(flet.Text(i)) for i in self.table_column_names],
+            show_checkbox_column=True,
+        )
+        self._page_label = flet.Text()
+        self._summary = flet.Text()
+        self._previous = flet.IconButton(
+            flet.icons.NAVIGATE_BEFORE, on_click=self.previous_page
+        )
+        self._next = flet.IconButton(flet.icons.NAVIGATE_NEXT, on_click=self.next_page)
+        # Only the rows in the visible window of the collection are
+        # materialized as DoseRows. Writers swap in a new read-only mapping
+        # rather than editing it, so rendering can read it without the lock.
+        self._rows: Mapping[int, DoseRow] = MappingProxyType({})
+        # The dose each selected slot held when it was selected
+        self._selected: dict[int, Dose] = {}
+        # When each visible row next looks different, see DoseStore.next_change;
+        # inf once it has expired
+        self._next_change: dict[int, float] = {}
+        self._offset = 0
+        # Set when another view changed the collection; the next tick redraws
+        self._stale = False
+        # Controls waiting to be sent to the page, in order, and the task
+        # sending them; see _queue
+        self._outbox: dict[Control, None] = {}
+        self._sender: asyncio.Task | None = None
+        # Only ticks, which all run on the one ticker task, update _next_change
+        # under the read side of the dose lock; everything else that changes
+        # view state holds the write side
+        self._ticker = shared_ticker if ticker is None else ticker
+        with self._dose_lock.write():
+            collection.subscribe(self._apply)
+            self._show_window()
+
+    @property
+    def doses(self) -> list[Dose]:
+        with self._dose_lock.read():
+            return list(self._collection.doses.values())
+
+    async def add_dose(
+        self, strain: str, method: IngestionMethod, ingested: DateTime = None
+    ):
+        await self.add_doses([Dose.new(strain, method, ingested)])
+
+    @timed("dose_manager.add")
+    async def add_doses(self, doses: Iterable[Dose]):
+        """Adds every dose in ``doses`` with a single UI update"""
+        with self._dose_lock.write():
+            self._collection.add(doses)
+            self._show_window()
+        await self.update_async()
+
+    async def delete_dose(self, dose: DoseRow, _=None):
+        await self.delete_doses([dose])
+
+    @timed("dose_manager.delete")
+    async def delete_doses(self, doses: Iterable[DoseRow]):
+        with self._dose_lock.write():
+            self._collection.remove([(dose.slot, dose.dose) for dose in doses])
+            self._show_window()
+        await self.update_async()
+
+    @timed("dose_manager.delete")
+    async def delete_selected(self, _=None):
+        with self._dose_lock.write():
+            self._collection.remove(list(self._selected.items()))
+            self._show_window()
+        await self.update_async()
+
+    async def select_dose(self, dose: DoseRow, e: ControlEvent):
+        with self._dose_lock.write():
+            if self._collection.doses.get(dose.slot) is not dose.dose:
+                return
+            dose.selected = e.data == "true"
+            if dose.selected:
+                self._selected[dose.slot] = dose.dose
+            else:
+                self._selected.pop(dose.slot, None)
+        await dose.update_async()
+
+    @timed("dose_manager.reset")
+    async def reset_dose(self, dose: DoseRow, _=None):
+        with self._dose_lock.write():
+            self._collection.reset(dose.slot, dose.dose)
+            self._show_window()
+        await self.update_async()
+
+    @timed("dose_manager.clear_expired")
+    async def clear_expired(self, _=None):
+        with self._dose_lock.write():
+            self._collection.remove_expired()
+            self._show_window()
+        await self.update_async()
+
+    async def next_page(self, _=None):
+        with self._dose_lock.write():
+            self._offset += self.page_size
+            self._show_window()
+        await self.update_async()
+
+    async def previous_page(self, _=None):
+        with self._dose_lock.write():
+            self._offset = max(self._offset - self.page_size, 0)
+            self._show_window()
+        await self.update_async()
+
+    def _apply(self, event: DoseEvent):
+        """Brings this view's selection in line with a change to the
+        collection, made through this view or any other, and marks the window
+        for a redraw"""
+        if event.doses:
+            for slot, dose in zip(event.slots, event.doses):
+                if slot in self._selected:
+                    self._selected[slot] = dose
+        else:
+            for slot in event.slots:
+                self._selected.pop(slot, None)
+        self._stale = True
+        self._ticker.wake()
+
+    def _show_window(self):
+        """Materializes DoseRows for the visible window, reusing existing rows"""
+        doses = self._collection.doses
+        total = len(doses)
+        if self._offset >= total:
+            self._offset = max(total - 1, 0) // self.page_size * self.page_size
+        end = min(self._offset + self.page_size, total)
+        rows = {}
+        for slot, dose in islice(doses.items(), self._offset, end):
+            if (row := self._rows.get(slot)) is None or row.dose is not dose:
+                row = DoseRow(
+                    dose,
+                    self.delete_dose,
+                    self.reset_dose,
+                    slot=slot,
+                    select=self.select_dose,
+                )
+                row.selected = slot in self._selected
+            rows[slot] = row
+        self._rows = MappingProxyType(rows)
+        self._next_change = {}
+        self._stale = False
+        for row, state in self.evaluate(rows.values()).items():
+            row.render(state)
+        self._table.rows = list(rows.values())
+        self._page_label.value = f"{self._offset + bool(total)}-{end} of {total}"
+        self._previous.disabled = self._offset == 0
+        self._next.disabled = end >= total
+        self._update_summary(self._collection.count_expired())
+
+    def _update_summary(self, expired: int) -> bool:
+        """Refreshes the dose count header, returning whether it changed"""
+        summary = f"{len(self._collection)} doses, {expired} expired"
+        if summary == self._summary.value:
+            return False
+        self._summary.value = summary
+        return True
+
+    def evaluate(
+        self, rows: Iterable[DoseRow] = None, at: DateTime | float = None
+    ) -> dict[DoseRow, DoseState]:
+        """Evaluates ``rows`` (default the visible ones) against a single clock
+        reading. Rows whose dose has since been reset or removed are left out.
+
+        The lock is only held while the store is read; building the states
+        happens on the copies.
+        """
+        rows = self._rows.values() if rows is None else rows
+        with self._dose_lock.read():
+            doses = self._collection.doses
+            rows = [row for row in rows if doses.get(row.slot) is row.dose]
+            state = self._collection.store.evaluate(at, [row.slot for row in rows])
+        return self._dose_states(
+            rows,
+            zip(
+                state.status.tolist(), state.progress.tolist(), state.remaining.tolist()
+            ),
+        )
+
+    @staticmethod
+    def _dose_states(
+        rows: Iterable[DoseRow], states: Iterable[tuple[int, float, float]]
+    ) -> dict[DoseRow, DoseState]:
+        """Pairs ``rows`` with DoseStates built from store status codes,
+        progress and seconds remaining"""
+        return {
+            row: DoseState(
+                _STATUSES[code],
+                progress,
+                "Expired" if code == EXPIRED else time_left_words(left),
+            )
+            for row, (code, progress, left) in zip(rows, states)
+        }
+
+    async def render(
+        self, rows: Iterable[DoseRow] = None, at: DateTime | float = None
+    ) -> int:
+        """Renders ``rows`` (default the visible ones) at ``at`` and flushes
+        every row that changed in a single page update. Returns the number of
+        rows sent.
+
+        Rows are diffed and updated outside ``_dose_lock``, so handlers that
+        change the collection never wait on a render.
+        """
+        states = self.evaluate(rows, at)
+        controls = self._send(states, self._collection.count_expired(at))
+        await self.flush()
+        return controls
+
+    @timed("dose_manager.render")
+    def _send(self, states: dict[DoseRow, DoseState], expired: int) -> int:
+        """Diffs ``states`` into their rows and ``expired`` into the summary,
+        then queues whatever changed for a single page update"""
+        changed = [row for row, state in states.items() if row.render(state)]
+        if self._update_summary(expired):
+            changed.append(self._summary)
+        self._queue(changed)
+        return len(changed)
+
+    def _queue(self, controls: Iterable[Control]):
+        """Queues ``controls`` for the page, to be sent by this view's own
+        sender task so a slow client never holds up a ticker pass. Controls
+        queued while a send is in flight are merged into the next one."""
+        self._outbox.update(dict.fromkeys(controls))
+        if self._outbox and (self._sender is None or self._sender.done()):
+            self._sender = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        while self._outbox:
+            controls = list(self._outbox)
+            self._outbox.clear()
+            try:
+                await self.page.update_async(*controls)
+            except Exception:
+                logger.exception("Sending %d controls failed", len(controls))
+                registry.counter("dose_manager.send_errors").inc()
+
+    async def flush(self):
+        """Waits until every queued update has been sent"""
+        if self._sender is not None:
+            await self._sender
+
+    async def did_mount_async(self):
+        self._ticker.register(self)
+
+    async def will_unmount_async(self):
+        self._ticker.unregister(self)
+        if self._sender is not None:
+            self._sender.cancel()
+        self._outbox.clear()
+
+    def _publish_metrics(self, rows: int, controls: int):
+        registry.counter("dose_manager.rows_rendered").inc(rows)
+        registry.counter("dose_manager.controls_updated").inc(controls)
+
+    @timed("dose_manager.tick")
+    async def tick(self, at: float = None, frames: dict = None) -> float | None:
+        """Runs one ticker pass at ``at`` (default now).
+
+        Each visible row that has not expired yet is given the instant its
+        status, time-left label or progress step next changes, and only rows
+        whose change is due are rendered. Expired rows are rendered once when
+        they expire and then left alone until ``retention`` archives them.
+        The window is rebuilt first if the collection changed since the last
+        pass. Collection-wide state comes from a TickFrame shared through
+        ``frames`` with the other views of the collection in the same pass.
+        Changes are queued for this view's sender rather than awaited; see
+        ``flush``. Returns when the next pass is due, or None if nothing will
+        change.
+        """
+        n = epoch(at)
+        collection = self._collection
+        if self.retention is not None:
+            cutoff = n - self.retention.total_seconds()
+            if collection.count_expired(cutoff):
+                collection.remove_expired(cutoff, "archive")
+        if stale := self._stale:
+            with self._dose_lock.write():
+                self._show_window()
+        with self._dose_lock.read():
+            frame = collection.frame(n, frames)
+            due = [s for s in self._rows if self._next_change.get(s, 0) <= n]
+            changes = frame.next_change(due, DoseRow.progress_steps)
+            self._next_change.update(zip(due, changes))
+            # Rows are current after the rebuild unless another thread changed
+            # the collection since; those wait for the next pass
+            doses = collection.doses
+            due = [s for s in due if doses.get(s) is self._rows[s].dose]
+            rows = [self._rows[s] for s in due]
+            states = frame.states(due)
+            expired = frame.count_expired()
+            wakes = [c for c in self._next_change.values() if c < inf]
+            # Off-screen expiries still change the summary header
+            if (expiry := frame.next_expiry()) is not None:
+                wakes.append(expiry)
+            if self.retention is not None:
+                if (expiry := frame.next_expiry(cutoff)) is not None:
+                    wakes.append(expiry + self.retention.total_seconds())
+        if stale:
+            self._queue([self])
+        controls = self._send(self._dose_states(rows, states), expired)
+        self._publish_metrics(len(rows), controls)
+        return min(wakes, default=None)
+
+    def build(self):
+        return Column(
+            [
+                self._summary,
+                self._table,
+                Row([self._previous, self._page_label, self._next]),
+            ]
+        )
+
+
+class DoseUI(UserControl):
+    def __init__(self, dm: DoseManager):
+        self.dm = dm
+        super().__init__()
+
+    # noinspection PyAttributeOutsideInit
+    def build(self):
+        ingest_methods = {
+            "EDIBLE": EDIBLE,
+            "DRY_HERB": DRY_HERB,
+            "TEST": FAKE_TEST_INGEST,
+        }
+        self.method_label = Text("How do you consume?")
+        self.method = RadioGroup(
+            content=Column(
+                [
+                    Radio(value="EDIBLE", label="Edibles"),
+                    Radio(value="DRY_HERB", label="Dry Herb"),
+                    Radio(value="TEST", label="Test"),
+                ],
+            ),
+            value="TEST",
+        )
+        self.method_details = Markdown()
+        self.strain = TextField(label="Strain?", value="TestStrain")
+        self.when_label = Text("When did you consume it?")
+        self.when_label2 = Text("How long ago? Roughly")
+        self.when_units = RadioGroup(
+            content=Row(
+                [
+                    Radio(value="minutes", label="Minutes"),
+                    Radio(value="hours", label="Hours"),
+                ]
+            ),
+            value="minutes",
+        )
+        self.when_value = TextField(value="0")
+        self.when_extended = Column(
+            controls=[self.when_label2, self.when_units, self.when_value],
+            visible=False,
+        )
+
+        async def change_when(e: ControlEvent):
+            self.when_extended.visible = e.data == "EARLIER"
+            await self.when_extended.update_async()
+
+        self.when = RadioGroup(
+            content=Row(
+                [
+                    Radio(value="NOW", label="Now"),
+                    Radio(value="EARLIER", label="Earlier"),
+                ],
+            ),
+            value="NOW",
+            on_change=change_when,
+        )
+
+        async def add(_):
+            ingested = now("utc")
+            if self.when.value != "NOW":
+                ingested = ingested - duration(
+                    **{self.when_units.value: int(self.when_value.value)}
+                )
+
+            await self.dm.add_dose(
+                self.strain.value, ingest_methods[self.method.value], ingested=ingested
+            )
+
+        return Column(
+            [
+                self.method_label,
+                self.method,
+                self.strain,
+                self.when_label,
+                self.when,
+                self.when_extended,
+                Row(
+                    [
+                        IconButton(
+                            icons.ADD,
+                            icon_size=40,
+                            icon_color="green",
+                            on_click=add,
+                            tooltip="Add new dose",
+                        ),
+                        IconButton(
+                            icons.DELETE_SWEEP,
+                            icon_size=40,
+                            icon_color="red",
+                            tooltip="Clear Expired doses",
+                            on_click=self.dm.clear_expired,
+                        ),
+                        IconButton(
+                            icons.DELETE,
+                            icon_size=40,
+                            icon_color="red",
+                            tooltip="Delete selected doses",
+                            on_click=self.dm.delete_selected,
+                        ),
+                    ]
+                ),
+            ]
+        )
+
+
+@cache
+def default_journal() -> DoseJournal:
+    """The process-wide journal shared by every session"""
+    return DoseJournal(os.environ.get("DOSER_JOURNAL", "doser.sqlite3"))
+
+
+@cache
+def default_collection() -> DoseCollection:
+    """The doses shared by every session, backed by ``default_journal()``"""
+    return DoseCollection(default_journal())
+
+
+@cache
+def metrics_server() -> MetricsServer | None:
+    """Starts the process-wide /metrics endpoint when DOSER_METRICS_PORT is set"""
+    if port := os.environ.get("DOSER_METRICS_PORT"):
+        return MetricsServer(int(port)).start()
+    return None
+
+
+async def main(page: flet.Page):
+    page.title = "Potato"
+    metrics_server()
+    await page.update_async()
+
+    dm = DoseManager(collection=default_collection(), retention=Duration(hours=1))
+    du = DoseUI(dm)
+    await page.add_async(
+        Row(
+            controls=[dm, VerticalDivider(visible=True), du],
+            vertical_alignment=flet.CrossAxisAlignment.START,
+        )
+    )
+    if dm.doses:
+        return
+    await dm.add_doses(
+        [
+            Dose.new("Test", FAKE_TEST_INGEST),
+            *(Dose.new("expired", FAKE_TEST_INGEST) for _ in range(10)),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    flet.app(target=main)
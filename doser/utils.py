@@ -1,19 +1,21 @@
 import time
-from functools import wraps
-from typing import NamedTuple, Any
 
+from pendulum import DateTime
 
-class TimedResult(NamedTuple):
-    result: Any
-    duration: float
+from doser import metrics
 
 
 def timer(f):
-    @wraps(f)
-    def inner(*args, **kwargs):
-        start = time.perf_counter()
-        ret = f(*args, **kwargs)
-        end = time.perf_counter()
-        return TimedResult(ret, end - start)
+    """Records each call's duration in the default metrics registry under the
+    function's qualified name, returning its result unchanged. See
+    ``doser.metrics``."""
+    return metrics.timed(f)
 
-    return inner
+
+def epoch(at: DateTime | float | None = None) -> float:
+    """Epoch seconds for ``at``, defaulting to now"""
+    if at is None:
+        return time.time()
+    if isinstance(at, DateTime):
+        return at.timestamp()
+    return at
@@ -0,0 +1,18 @@
+from unittest import mock
+
+import pytest
+
+
+@pytest.fixture
+def mock_page():
+    """Stands in for a connected flet page. DoseManager and DoseRow updates
+    go nowhere, and page updates are recorded on the returned mock."""
+    from doser import ui
+
+    page = mock.AsyncMock()
+    with mock.patch.object(ui.DoseManager, "update_async"), mock.patch.object(
+        ui.DoseRow, "update_async"
+    ), mock.patch.object(
+        ui.DoseManager, "page", new_callable=mock.PropertyMock, return_value=page
+    ):
+        yield page
@@ -13,3 +13,52 @@ def test_status(time_machine, dose_type):
     assert dose.status == doser.DoseStatus.active
     time_machine.move_to(dose.active_time.end)
     assert dose.status == doser.DoseStatus.expired
+
+
+def test_state_at():
+    import doser
+
+    dose = doser.Dose.new("potato", doser.DRY_HERB)
+    at = dose.processing_time.end.add(hours=1)
+    state = dose.state_at(at)
+    assert state.status == doser.DoseStatus.active
+    assert state.prog_value == 0.5
+    assert state.time_left == "1 hour"
+    assert dose.state_at(dose.active_time.end) == (
+        doser.DoseStatus.expired,
+        1,
+        "Expired",
+    )
+
+
+def test_import_is_headless():
+    import subprocess
+    import sys
+
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, doser; doser.Dose.new('potato', doser.EDIBLE);"
+            " assert 'flet' not in sys.modules",
+        ],
+        check=True,
+    )
+
+
+def test_time_left_words():
+    import doser
+    from doser.core import LABEL_EPSILON, _words
+
+    _words.cache_clear()
+    assert doser.time_left_words(3725.9) == "1 hour 2 minutes 5 seconds"
+    assert doser.time_left_words(3725.1) == "1 hour 2 minutes 5 seconds"
+    assert doser.time_left_words(0.5) == "0.50 second"
+    assert _words.cache_info().hits == 1
+
+    # 89.75s left reads "1 minute 29 seconds" until just after 89s are left
+    change = doser.next_label_change(end=100.0, at=10.25)
+    assert change == pytest.approx(11.0 + LABEL_EPSILON)
+    assert doser.time_left_words(100.0 - change) == "1 minute 28 seconds"
+    assert doser.time_left_words(100.0 - 11.0) == "1 minute 29 seconds"
+    assert doser.next_label_change(end=100.0, at=99.5) == 100.0
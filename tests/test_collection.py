@@ -0,0 +1,172 @@
+import asyncio
+import gc
+import time
+from unittest import mock
+
+
+def test_events():
+    import doser
+    from doser.collection import DoseCollection, DoseEvent
+
+    class Listener:
+        def __init__(self):
+            self.events = []
+
+        def __call__(self, event):
+            self.events.append(event)
+
+    collection = DoseCollection()
+    listener = Listener()
+    collection.subscribe(listener.__call__)
+    dose = doser.Dose.new("potato", doser.EDIBLE)
+    expired = doser.Dose.new("tomato", doser.FAKE_TEST_INGEST, time.time() - 60)
+    a, b = collection.add([dose, expired])
+    reset = collection.reset(a, dose)
+    assert collection.reset(a, dose) is None
+    assert collection.remove_expired() == [b]
+    collection.remove([(a, dose)])
+    assert len(collection) == 1
+    collection.remove([(a, reset)])
+    assert listener.events == [
+        DoseEvent("add", (a, b), (dose, expired)),
+        DoseEvent("reset", (a,), (reset,)),
+        DoseEvent("clear", (b,)),
+        DoseEvent("delete", (a,)),
+    ]
+
+    del listener
+    gc.collect()
+    collection.add([dose])
+    assert collection._subscribers == []
+
+
+def test_frames_publish_status_counts():
+    import doser
+    from doser.collection import DoseCollection
+    from doser.metrics import registry
+
+    now = time.time()
+    ingested = now - 30 * 60
+    collection = DoseCollection()
+    label = collection._metric_labels["collection"]
+
+    def counts():
+        return {
+            dict(key)["status"]: value
+            for (name, key), value in registry.gauges().items()
+            if name == "dose_collection.doses" and dict(key)["collection"] == label
+        }
+
+    processing = doser.Dose.new("processing", doser.EDIBLE, now)
+    slot, *_ = collection.add(
+        [
+            processing,
+            doser.Dose.new("active", doser.DRY_HERB, ingested),
+            doser.Dose.new("expired", doser.FAKE_TEST_INGEST, ingested),
+        ]
+    )
+    with collection.lock.read():
+        collection.frame(now)
+    assert counts() == {"processing": 1, "active": 1, "expired": 1}
+    collection.remove([(slot, processing)])
+    with collection.lock.read():
+        collection.frame(now + 24 * 3600)
+    assert counts() == {"processing": 0, "active": 0, "expired": 2}
+
+    del collection
+    gc.collect()
+    assert counts() == {}
+
+
+def test_views_share_a_collection(mock_page):
+    from doser import ui
+    from doser.collection import DoseCollection
+
+    async def scenario():
+        collection = DoseCollection()
+        first = ui.DoseManager(collection=collection)
+        second = ui.DoseManager(collection=collection)
+        await first.add_dose("potato", ui.EDIBLE)
+        await first.add_dose("tomato", ui.EDIBLE)
+        assert [r.dose.strain for r in first._table.rows] == ["potato", "tomato"]
+        assert second._stale
+
+        show_window = second._show_window
+
+        def rebuild():
+            # Readers never change view state; the rebuild takes the write side
+            assert collection.lock._writer is not None
+            show_window()
+
+        with mock.patch.object(second, "_show_window", rebuild):
+            await second.tick()
+        assert not second._stale
+        assert [r.dose.strain for r in second._table.rows] == ["potato", "tomato"]
+        await second.select_dose(second._table.rows[0], mock.Mock(data="true"))
+
+        await first.delete_dose(first._table.rows[0])
+        assert second.doses == first.doses
+        assert second._selected == {}
+        await second.tick()
+        assert [r.dose.strain for r in second._table.rows] == ["tomato"]
+        assert second._summary.value == "1 doses, 0 expired"
+
+    asyncio.run(scenario())
+
+
+def test_stale_rows_do_not_touch_a_reused_slot(mock_page):
+    from doser import ui
+    from doser.collection import DoseCollection
+
+    async def scenario():
+        collection = DoseCollection()
+        first = ui.DoseManager(collection=collection)
+        second = ui.DoseManager(collection=collection)
+        await first.add_dose("potato", ui.EDIBLE)
+        await second.tick()
+        (stale,) = second._table.rows
+        await first.delete_dose(first._table.rows[0])
+        await first.add_dose("tomato", ui.EDIBLE)
+        (fresh,) = first._table.rows
+        assert fresh.slot == stale.slot
+
+        # The second view has not redrawn yet, so its row still shows potato
+        await second.select_dose(stale, mock.Mock(data="true"))
+        await second.reset_dose(stale)
+        await second.delete_dose(stale)
+        await second.delete_selected()
+        assert collection.doses == {fresh.slot: fresh.dose}
+
+    asyncio.run(scenario())
+
+
+def test_views_share_a_tick_frame(mock_page):
+    from doser import ui
+    from doser.collection import DoseCollection
+
+    async def scenario():
+        collection = DoseCollection()
+        views = [ui.DoseManager(collection=collection) for _ in range(2)]
+        await views[0].add_dose("potato", ui.EDIBLE)
+        # Settle the second view's rebuild after the add
+        await views[1].tick()
+        store = collection.store
+        with mock.patch.object(
+            store, "next_change", wraps=store.next_change
+        ) as next_change, mock.patch.object(
+            store, "evaluate", wraps=store.evaluate
+        ) as evaluate:
+            frames = {}
+            at = time.time()
+            wakes = [await view.tick(at, frames) for view in views]
+        assert next_change.call_count == evaluate.call_count == 1
+        assert wakes[0] == wakes[1]
+        assert frames[collection].at == at
+
+        # A change in between makes the next view start a new frame
+        frame = frames[collection]
+        await views[0].add_dose("tomato", ui.EDIBLE)
+        await views[1].tick(at, frames)
+        assert frames[collection] is not frame
+
+    asyncio.run(scenario())
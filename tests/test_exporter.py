@@ -0,0 +1,38 @@
+import urllib.request
+
+
+def test_exposition():
+    from doser.exporter import exposition
+    from doser.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    registry.record("dose_manager.tick", 0.5)
+    registry.counter("dose_manager.rows_rendered").inc(3)
+    registry.gauge("dose_manager.doses", status="active", manager="1").set(2)
+    registry.gauge("dose_manager.doses", status="expired", manager="1").set(1)
+    text = exposition(registry)
+    assert "# TYPE doser_dose_manager_tick_seconds summary" in text
+    assert 'doser_dose_manager_tick_seconds{quantile="0.99"} 0.5' in text
+    assert "doser_dose_manager_tick_seconds_count 1" in text
+    assert "doser_dose_manager_rows_rendered_total 3" in text
+    assert text.count("# TYPE doser_dose_manager_doses gauge") == 1
+    assert 'doser_dose_manager_doses{manager="1",status="active"} 2' in text
+
+    registry.remove_gauges(manager="1")
+    assert "doser_dose_manager_doses" not in exposition(registry)
+
+
+def test_server():
+    from doser.exporter import CONTENT_TYPE, MetricsServer
+    from doser.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    registry.counter("scrapes").inc()
+    server = MetricsServer(0, registry=registry).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert b"doser_scrapes_total 1" in response.read()
+    finally:
+        server.stop()
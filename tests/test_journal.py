@@ -0,0 +1,84 @@
+def test_replay(tmp_path):
+    import doser
+    from doser.journal import DoseJournal
+
+    journal = DoseJournal(tmp_path / "doses.sqlite3", flush_interval=0)
+    first = doser.Dose.new("potato", doser.EDIBLE)
+    second = doser.Dose.new("tomato", doser.DRY_HERB)
+    first_id = journal.add(first)
+    second_id = journal.add(second)
+    third_id = journal.add(doser.Dose.new("expired", doser.FAKE_TEST_INGEST))
+    second = second.now_from_this()
+    journal.reset(second_id, second)
+    journal.delete(third_id, "clear")
+    journal.close()
+
+    reopened = DoseJournal(tmp_path / "doses.sqlite3")
+    assert reopened.load() == {first_id: first, second_id: second}
+    assert reopened.archived() == {}
+    assert reopened.add(first) == third_id + 1
+    reopened.close()
+
+
+def test_archived_doses_are_kept(tmp_path):
+    import doser
+    from doser.journal import DoseJournal
+
+    journal = DoseJournal(tmp_path / "doses.sqlite3", flush_interval=0)
+    old = doser.Dose.new("old", doser.FAKE_TEST_INGEST)
+    old_id = journal.add(old)
+    deleted_id = journal.add(doser.Dose.new("deleted", doser.EDIBLE))
+    journal.delete(old_id, "archive")
+    journal.delete(deleted_id)
+    journal.flush()
+    assert journal.load() == {}
+    assert journal.archived() == {old_id: old}
+    journal.close()
+
+
+def test_writer_survives_a_failed_batch(tmp_path):
+    import sqlite3
+
+    import doser
+    from doser.journal import DoseJournal, SCHEMA
+    from doser.metrics import registry
+
+    path = tmp_path / "doses.sqlite3"
+    journal = DoseJournal(path, flush_interval=0)
+    dropped = registry.counter("journal.dropped").value
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE journal")
+    journal.add(doser.Dose.new("lost", doser.EDIBLE))
+    # Returns rather than waiting on a writer thread that died
+    journal.flush()
+    assert registry.counter("journal.dropped").value == dropped + 1
+
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+    dose = doser.Dose.new("potato", doser.EDIBLE)
+    dose_id = journal.add(dose)
+    journal.flush()
+    assert journal.load() == {dose_id: dose}
+    journal.close()
+
+
+def test_manager_restores_from_journal(tmp_path):
+    import asyncio
+    from unittest import mock
+
+    import doser
+    from doser.journal import DoseJournal
+
+    journal = DoseJournal(tmp_path / "doses.sqlite3", flush_interval=0)
+
+    async def scenario():
+        dm = doser.DoseManager(journal=journal)
+        await dm.add_dose("potato", doser.EDIBLE)
+        await dm.add_dose("tomato", doser.EDIBLE)
+        await dm.delete_dose(dm._table.rows[0])
+        journal.flush()
+        assert doser.DoseManager(journal=journal).doses == dm.doses
+
+    with mock.patch.object(doser.DoseManager, "update_async"):
+        asyncio.run(scenario())
+    journal.close()
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+
+def test_readers_share_and_writers_exclude():
+    from doser.locks import RWLock
+
+    lock = RWLock("test")
+    inside = threading.Barrier(2, timeout=1)
+
+    def reader():
+        with lock.read():
+            # Both readers must be inside at once to pass the barrier
+            inside.wait()
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    for thread in readers:
+        thread.join()
+    assert not inside.broken
+
+    events = []
+
+    def writer():
+        with lock.write():
+            events.append("write")
+
+    with lock.read():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        thread.join(timeout=0.05)
+        # Re-entering the read side does not queue behind the waiting writer
+        with lock.read():
+            events.append("read")
+    thread.join()
+    assert events == ["read", "write"]
+
+
+def test_reentrancy():
+    from doser.locks import RWLock
+
+    lock = RWLock("test")
+    with lock.write():
+        with lock.write(), lock.read():
+            pass
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            with lock.write():
+                pass
+    with lock.write():
+        pass
+
+
+def test_tasks_own_their_holds():
+    from doser.locks import RWLock
+
+    lock = RWLock("test")
+
+    async def holder(exclusive: bool, held: asyncio.Event, release: asyncio.Event):
+        with lock.write() if exclusive else lock.read():
+            held.set()
+            await release.wait()
+
+    async def scenario(exclusive: bool):
+        held, release = asyncio.Event(), asyncio.Event()
+        task = asyncio.create_task(holder(exclusive, held, release))
+        await held.wait()
+        # Another task is not reentrant, and waiting would hang the loop
+        with pytest.raises(RuntimeError):
+            with lock.write():
+                pass
+        if exclusive:
+            with pytest.raises(RuntimeError):
+                with lock.read():
+                    pass
+        else:
+            with lock.read():
+                pass
+        release.set()
+        await task
+        with lock.write():
+            pass
+
+    asyncio.run(scenario(exclusive=False))
+    asyncio.run(scenario(exclusive=True))
+
+
+def test_metrics_per_call_site():
+    from doser.locks import RWLock
+    from doser.metrics import MetricsRegistry
+
+    metrics = MetricsRegistry()
+    lock = RWLock("test", metrics)
+
+    def render():
+        with lock.read():
+            with lock.read():
+                pass
+
+    render()
+    with lock.write("archive"):
+        pass
+    counts = {name: s.count for name, s in metrics.snapshot().items()}
+    assert counts == {
+        "test.archive.write_hold": 1,
+        "test.archive.write_wait": 1,
+        f"test.{render.__name__}.read_hold": 1,
+        f"test.{render.__name__}.read_wait": 1,
+    }
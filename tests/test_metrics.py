@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+
+def test_histogram_percentiles():
+    from doser.metrics import Histogram
+
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    snapshot = histogram.snapshot()
+    assert snapshot.count == 1000
+    assert snapshot.max == 1.0
+    assert snapshot.p50 == pytest.approx(0.5, rel=0.01)
+    assert snapshot.p95 == pytest.approx(0.95, rel=0.01)
+    assert snapshot.p99 == pytest.approx(0.99, rel=0.01)
+    assert snapshot.total == pytest.approx(500.5)
+
+
+def test_timed_keeps_return_values():
+    from doser.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+
+    @registry.timed
+    def double(x):
+        return x * 2
+
+    @registry.timed("async")
+    async def triple(x):
+        return x * 3
+
+    assert double(2) == 4
+    assert asyncio.run(triple(2)) == 6
+    with registry.time("block"):
+        pass
+
+    registry.enabled = False
+    assert double(3) == 6
+    with registry.time("block"):
+        pass
+
+    counts = {name: s.count for name, s in registry.snapshot().items()}
+    assert counts == {
+        "async": 1,
+        "block": 1,
+        f"{__name__}.test_timed_keeps_return_values.<locals>.double": 1,
+    }
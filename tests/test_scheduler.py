@@ -0,0 +1,78 @@
+import pytest
+
+
+def test_expiry_index():
+    from doser.scheduler import ExpiryIndex
+
+    index = ExpiryIndex()
+    for key, end in [("a", 30), ("b", 10), ("c", 20), ("d", 20)]:
+        index.add(key, end)
+    index.add("a", 5)
+    index.discard("c")
+    index.discard("missing")
+
+    assert index.count_expired(4) == 0
+    assert index.count_expired(20) == 3
+    assert index.next_expiry(10) == 20
+    assert index.pop_expired(10) == ["a", "b"]
+    assert len(index) == 1
+    assert index.next_expiry(20) is None
+
+
+def test_expiry_index_discard_many():
+    from doser.scheduler import ExpiryIndex
+
+    for limit in (0, 64):
+        index = ExpiryIndex()
+        index.in_place_limit = limit
+        for i in range(10):
+            index.add(i, i % 5)
+        index.discard_many([0, 1, 5, 9, "missing"])
+        assert index.pop_expired(10) == [6, 2, 7, 3, 8, 4]
+        assert len(index) == 0
+
+
+def test_tick_pacer():
+    from doser.scheduler import TickPacer
+
+    pacer = TickPacer()
+    base = pacer.min_interval
+    assert pacer.next_deadline(0.0, 0.001, 5.0) == (5.0, 0.0)
+    assert pacer.interval == base
+
+    # A pass slower than its budget degrades the rate and reports lateness
+    deadline, late = pacer.next_deadline(10.0, 10.5, 10.1)
+    assert pacer.interval == base * 2
+    assert late == pytest.approx(0.4)
+    assert deadline == 10.1
+    for _ in range(20):
+        pacer.next_deadline(20.0, 25.0, None)
+    assert pacer.interval == pacer.max_interval
+    assert pacer.next_deadline(30.0, 30.5, 30.5) == (32.0, 0.0)
+
+    # Cheap passes recover the full rate
+    for _ in range(20):
+        pacer.next_deadline(40.0, 40.0, None)
+    assert pacer.interval == base
+
+
+def test_onset_counter():
+    from doser.scheduler import OnsetCounter
+
+    counter = OnsetCounter()
+    for key, onset in [("a", 10), ("b", 20), ("c", 30)]:
+        counter.add(key, onset)
+    counter.add("a", 25)
+    counter.discard("c")
+    assert counter.advance(15) == 2
+    assert counter.advance(20) == 1
+    # Never moves back, and keys added behind it are not pending
+    assert counter.advance(5) == 1
+    counter.add("d", 18)
+    assert counter.advance(25) == len(counter) == 0
+
+    # Discarded entries do not pile up while nothing advances it
+    for i in range(1000):
+        counter.add(i, 100)
+        counter.discard(i)
+    assert len(counter._heap) <= 64
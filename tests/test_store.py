@@ -0,0 +1,68 @@
+import pytest
+from pendulum import datetime
+
+from doser.core import LABEL_EPSILON
+
+
+def test_evaluate_matches_dose():
+    import doser
+    from doser.store import DoseStore
+
+    start = datetime(2022, 1, 1)
+    doses = [
+        doser.Dose.new("potato", method, start.add(minutes=m))
+        for method in (doser.DRY_HERB, doser.EDIBLE)
+        for m in range(0, 600, 45)
+    ]
+    store = DoseStore(capacity=4)
+    slots = [store.add(dose) for dose in doses]
+    store.remove(slots.pop(3))
+    doses.pop(3)
+
+    at = start.add(hours=3)
+    state = store.evaluate(at, slots)
+    for dose, code, progress in zip(doses, state.status, state.progress):
+        expected = dose.state_at(at)
+        assert tuple(doser.DoseStatus)[code] == expected.status
+        assert progress == expected.prog_value
+    assert len(store) == len(doses)
+    assert sorted(store.slots().tolist()) == sorted(slots)
+
+
+def test_next_change():
+    import doser
+    from doser.store import DoseStore
+
+    start = datetime(2022, 1, 1).timestamp()
+    store = DoseStore()
+    edible = store.add(doser.Dose.new("potato", doser.EDIBLE, start))
+    expired = store.add(doser.Dose.new("expired", doser.FAKE_TEST_INGEST, start))
+
+    at = start + 60.25
+    change = store.next_change(at, [edible, expired])
+    # The label counts whole seconds; the progress step is 7200 / 200 = 36s
+    assert change[0] == pytest.approx(at + 0.75 + LABEL_EPSILON)
+    assert change[1] == float("inf")
+    assert store.next_change(at, [edible], progress_steps=7200)[0] == at + 0.25
+    assert store.next_change(start + 0.5, [edible])[0] == pytest.approx(
+        start + 1 + LABEL_EPSILON
+    )
+
+
+def test_next_change_updates_the_label():
+    import doser
+    from doser.store import DoseStore
+
+    start = datetime(2022, 1, 1).timestamp()
+    store = DoseStore()
+    dose = doser.Dose.new("potato", doser.EDIBLE, start)
+    slot = store.add(dose)
+    # Active with 5:58:19.7 left; the label next changes to "...18 seconds"
+    at = dose.active_end - 21499.7
+    change = store.next_change(at, [slot], progress_steps=1)[0]
+    before = doser.time_left_words(dose.active_end - at)
+    after = doser.time_left_words(dose.active_end - change)
+    assert (before, after) == (
+        "5 hours 58 minutes 19 seconds",
+        "5 hours 58 minutes 18 seconds",
+    )
@@ -0,0 +1,67 @@
+import asyncio
+
+
+class FakeView:
+    def __init__(self, wake_in: float | None, fail: bool = False):
+        self.wake_in = wake_in
+        self.fail = fail
+        self.ticks = []
+
+    async def tick(self, at: float = None, frames: dict = None):
+        self.ticks.append(at)
+        self.frames = frames
+        if self.fail:
+            raise RuntimeError("boom")
+        return None if self.wake_in is None else at + self.wake_in
+
+
+def test_tick_shares_one_clock_reading():
+    from doser.ticker import Ticker
+
+    ticker = Ticker()
+    views = [FakeView(5), FakeView(2), FakeView(None), FakeView(1, fail=True)]
+    for view in views:
+        ticker._views.add(view)
+    assert asyncio.run(ticker.tick(100.0)) == 102.0
+    assert [v.ticks for v in views] == [[100.0]] * 4
+    assert all(v.frames is views[0].frames for v in views)
+
+
+def test_task_follows_registered_views():
+    from doser.ticker import Ticker
+
+    async def scenario():
+        ticker = Ticker()
+        a, b = FakeView(None), FakeView(None)
+        ticker.register(a)
+        ticker.register(b)
+        task = ticker._task
+        await asyncio.sleep(0.01)
+        assert len(a.ticks) == len(b.ticks) >= 1
+        ticker.unregister(a)
+        assert not task.done()
+        ticker.unregister(b)
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert len(ticker) == 0
+
+    asyncio.run(scenario())
+
+
+def test_wake_respects_the_pacer():
+    from doser.ticker import Ticker
+
+    async def scenario():
+        ticker = Ticker()
+        ticker.pacer.min_interval = ticker.pacer.interval = 0.2
+        view = FakeView(None)
+        ticker.register(view)
+        await asyncio.sleep(0.05)
+        ticker.wake()
+        await asyncio.sleep(0.05)
+        assert len(view.ticks) == 1
+        await asyncio.sleep(0.2)
+        assert len(view.ticks) == 2
+        ticker.unregister(view)
+
+    asyncio.run(scenario())
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from unittest import mock
+
+
+def test_row_update_skips_unchanged():
+    from doser import ui
+
+    dose = ui.Dose.new("potato", ui.EDIBLE)
+    row = ui.DoseRow(dose, delete=print, reset=print)
+    at = dose.active_time.end
+    with mock.patch.object(ui.DataRow, "update") as sent:
+        assert row.update(dose.state_at(at))
+        assert not row.update(dose.state_at(at.add(hours=1)))
+        assert row.update(dose.state_at(dose.processing_time.start))
+    assert sent.call_count == 2
+
+
+def test_manager_materializes_visible_window():
+    from doser import ui
+
+    async def scenario():
+        dm = ui.DoseManager()
+        await dm.add_dose("0", ui.EDIBLE)
+        await dm.add_doses(ui.Dose.new(str(i), ui.EDIBLE) for i in range(1, 120))
+        assert len(dm.doses) == 120
+        assert [r.dose.strain for r in dm._table.rows] == list(map(str, range(50)))
+        await dm.next_page()
+        await dm.next_page()
+        assert [r.dose.strain for r in dm._table.rows] == list(
+            map(str, range(100, 120))
+        )
+        await dm.delete_dose(dm._table.rows[0])
+        assert dm._table.rows[0].dose.strain == "101"
+        assert len(dm.doses) == 119
+
+    with mock.patch.object(ui.DoseManager, "update_async") as update:
+        asyncio.run(scenario())
+    assert update.call_count == 5
+
+
+def test_tick_sends_one_update(mock_page):
+    from doser import ui
+
+    async def scenario():
+        dm = ui.DoseManager()
+        now = time.time()
+        await dm.add_doses(
+            [
+                ui.Dose.new("expired", ui.FAKE_TEST_INGEST, now - 3600),
+                ui.Dose.new("a", ui.EDIBLE, now),
+                ui.Dose.new("b", ui.EDIBLE, now),
+            ]
+        )
+        _, a, b = dm._table.rows
+        await dm.tick(now + 24 * 3600)
+        await dm.flush()
+        # The already expired row is due but unchanged, so it is not sent
+        mock_page.update_async.assert_awaited_once_with(a, b, dm._summary)
+        assert dm._summary.value == "3 doses, 3 expired"
+
+    asyncio.run(scenario())
+
+
+def test_bulk_delete(mock_page):
+    from doser import ui
+
+    async def scenario():
+        dm = ui.DoseManager()
+        start = time.time() - 3600
+        await dm.add_doses(
+            ui.Dose.new(str(i), ui.FAKE_TEST_INGEST if i % 2 else ui.EDIBLE, start)
+            for i in range(10)
+        )
+        await dm.clear_expired()
+        assert [d.strain for d in dm.doses] == ["0", "2", "4", "6", "8"]
+        rows = dm._table.rows
+        for row in rows[1:3]:
+            await dm.select_dose(row, mock.Mock(data="true"))
+        await dm.select_dose(rows[2], mock.Mock(data="false"))
+        await dm.select_dose(rows[3], mock.Mock(data="true"))
+        await dm.delete_selected()
+        assert [d.strain for d in dm.doses] == ["0", "4", "8"]
+        await dm.delete_doses(dm._table.rows[:2])
+        assert [d.strain for d in dm.doses] == ["8"]
+        assert len(dm._collection.store) == 1
+
+    asyncio.run(scenario())
+
+
+def test_delete_twice(mock_page):
+    from doser import ui
+
+    async def scenario():
+        dm = ui.DoseManager()
+        await dm.add_doses(ui.Dose.new(str(i), ui.EDIBLE) for i in range(3))
+        first, second = dm._table.rows[:2]
+        await dm.delete_dose(first)
+        # A double click, or a reset racing a delete, finds the row gone
+        await dm.delete_doses([first, second])
+        await dm.reset_dose(first)
+        assert [d.strain for d in dm.doses] == ["2"]
+        collection = dm._collection
+        assert len(collection.store) == 1
+        assert collection.count_expired(float("inf")) == 1
+
+    asyncio.run(scenario())
+
+
+def test_retention_archives_old_expired_doses(mock_page):
+    from pendulum import Duration
+
+    from doser import ui
+
+    async def scenario():
+        dm = ui.DoseManager(retention=Duration(minutes=10), ticker=ui.Ticker())
+        now = time.time()
+        await dm.add_doses(
+            [
+                ui.Dose.new("old", ui.FAKE_TEST_INGEST, now - 3600),
+                ui.Dose.new("recent", ui.FAKE_TEST_INGEST, now - 60),
+                ui.Dose.new("live", ui.EDIBLE, now),
+            ]
+        )
+        await dm.tick()
+        assert [d.strain for d in dm.doses] == ["recent", "live"]
+
+    asyncio.run(scenario())
+
+
+def test_tick_does_not_wait_for_the_client(mock_page):
+    from doser import ui
+
+    async def scenario():
+        sent = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow(*controls):
+            sent.set()
+            await release.wait()
+
+        mock_page.update_async.side_effect = slow
+        dm = ui.DoseManager()
+        await dm.add_doses(ui.Dose.new(str(i), ui.EDIBLE) for i in range(3))
+        at = time.time()
+        await asyncio.wait_for(dm.tick(at + 60), 1)
+        await sent.wait()
+        # Ticks keep running while the client is stuck on the first send
+        await asyncio.wait_for(dm.tick(at + 120), 1)
+        await asyncio.wait_for(dm.tick(at + 180), 1)
+        release.set()
+        await dm.flush()
+        assert mock_page.update_async.await_count == 2
+
+    asyncio.run(scenario())
+
+
+def test_render_does_not_hold_the_lock(mock_page):
+    import threading
+
+    from doser import ui
+
+    dm = ui.DoseManager()
+    held = []
+    render = ui.DoseRow.render
+
+    def probe():
+        with dm._dose_lock.write():
+            pass
+
+    def check(row, state=None):
+        # A writer on another thread blocks while this thread holds the lock
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join(timeout=1)
+        held.append(thread.is_alive())
+        return render(row, state)
+
+    async def scenario():
+        await dm.add_doses(ui.Dose.new(str(i), ui.EDIBLE) for i in range(3))
+        rows = dm._rows
+        await dm.delete_dose(dm._table.rows[0])
+        assert dm._rows is not rows and len(rows) == 3
+        held.clear()
+        with mock.patch.object(ui.DoseRow, "render", check):
+            await dm.tick(time.time() + 3600)
+        assert held == [False, False]
+
+    asyncio.run(scenario())